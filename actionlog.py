@@ -0,0 +1,216 @@
+# IRC Poker Duel - actionlog.py
+# Copyright (C) 2014  Daniel Kessler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""A log of what happens at every table, so the games in progress can be
+rebuilt when the bot is restarted.
+
+Each line of the log is one record:
+
+    table ID CHANNEL SMALLBLIND NICK...   a table was opened
+    deal ID SEED BUTTON HANDS CHIPS...    a hand was dealt with
+                                          newHand(seed=SEED), starting from
+                                          that button, hand count and chips
+    act ID ACTION [AMOUNT]                a player made a move, see apply
+    nick ID SEAT NICK                     a player changed nick
+    end ID                                the table was closed
+
+A deal record has everything needed to start its hand, so a table is
+rebuilt from its table record, its last deal and the moves after that.
+Once enough records have been added the log is rewritten with only those,
+so it does not grow without limit.  Records are written as they happen but
+only flushed to disk every sync_interval seconds, and the wait for the disk
+can be left to another thread."""
+
+import os
+
+from poker import PokerException, TexasHoldemGame
+
+ACTIONS = {
+    "check": lambda game, amount: game.poker_check(),
+    "fold": lambda game, amount: game.poker_fold(),
+    "bet": lambda game, amount: game.poker_bet(amount),
+    "call": lambda game, amount: game.poker_call(),
+    "raiseby": lambda game, amount: game.poker_raise_by(amount),
+    "raiseto": lambda game, amount: game.poker_raise_to(amount),
+    "allin": lambda game, amount: game.poker_allin(),
+    "advance": lambda game, amount: game.poker_advance(),
+}
+
+def apply(game, action, amount=None):
+    """Make the move called action in game, e.g. apply(game, "bet", 10)."""
+    ACTIONS[action](game, amount)
+
+def fsync(fd):
+    """Wait for everything written to fd to reach the disk, then close it."""
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class ActionLog:
+    def __init__(self, path, call_later, run_slow=None, sync_interval=0.5,
+                 compact_every=10000):
+        """Open the log at path, reading the tables already in it.
+        call_later(delay, callback) is used to schedule syncs, and
+        run_slow(callback, fn, *args), if given, to wait for the disk
+        without holding up the caller, as irc.run_slow does."""
+        self.path = path
+        self.call_later = call_later
+        self.run_slow = run_slow
+        self.sync_interval = sync_interval
+        self.compact_every = compact_every
+        self.sync_scheduled = False
+
+        # table id -> [table record, last deal record, act records...],
+        # where each record is a list of strings
+        self.tables = {}
+        # records in the file, and how many of them were written by the
+        # last compaction
+        self.written = 0
+        self.compacted = 0
+        self.read()
+        self.file = open(path, "a")
+
+    def read(self):
+        try:
+            logfile = open(self.path)
+        except IOError:
+            return
+        # where the last complete record ends
+        end = 0
+        torn = False
+        with logfile:
+            for line in logfile:
+                if not line.endswith("\n"):
+                    # the rest of the line was lost in a crash
+                    torn = True
+                    break
+                try:
+                    self.track(line.split())
+                except (IndexError, KeyError, ValueError):
+                    print("Skipping bad action log record: " + line.rstrip())
+                self.written += 1
+                end += len(line)
+        if torn:
+            # cut the piece off, or the next record would be appended to it
+            with open(self.path, "r+") as logfile:
+                logfile.truncate(end)
+
+    def track(self, record):
+        """Update self.tables with record."""
+        kind, tableid = record[0], int(record[1])
+        if kind == "table":
+            self.tables[tableid] = [record]
+        elif kind == "deal":
+            self.tables[tableid][1:] = [record]
+        elif kind == "act":
+            self.tables[tableid].append(record)
+        elif kind == "nick":
+            self.tables[tableid][0][4 + int(record[2])] = record[3]
+        elif kind == "end":
+            del self.tables[tableid]
+        else:
+            raise ValueError("Unknown record " + kind)
+
+    def write(self, *record):
+        record = map(str, record)
+        self.track(record)
+        self.file.write(" ".join(record) + "\n")
+        self.written += 1
+        if self.written - self.compacted >= self.compact_every:
+            self.compact()
+        elif not self.sync_scheduled:
+            self.sync_scheduled = True
+            self.call_later(self.sync_interval, self.sync)
+
+    def sync(self):
+        self.sync_scheduled = False
+        self.file.flush()
+        if self.run_slow == None:
+            os.fsync(self.file.fileno())
+        else:
+            # compact may close the file before the fsync runs, so it gets
+            # a descriptor of its own
+            self.run_slow(lambda result: None, fsync, os.dup(self.file.fileno()))
+
+    def compact(self):
+        """Rewrite the log with only the records needed to rebuild the
+        tables.  The new log replaces the old one in a single rename."""
+        self.file.close()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as logfile:
+            for tableid in sorted(self.tables):
+                for record in self.tables[tableid]:
+                    logfile.write(" ".join(record) + "\n")
+            logfile.flush()
+            os.fsync(logfile.fileno())
+        os.rename(tmp, self.path)
+        self.file = open(self.path, "a")
+        self.written = self.compacted = sum(map(len, self.tables.itervalues()))
+
+    def close(self):
+        self.sync_scheduled = False
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+    def open_table(self, tableid, channel, smallblind, players):
+        self.write("table", tableid, channel, smallblind, *players)
+
+    def deal(self, tableid, game, seed):
+        """Record that game is about to start a hand with newHand(seed=seed)."""
+        self.write("deal", tableid, seed, game.buttonLocation, game.handsPlayed,
+                   *[p.chips for p in game.players])
+
+    def act(self, tableid, action, amount=None):
+        if amount == None:
+            self.write("act", tableid, action)
+        else:
+            self.write("act", tableid, action, amount)
+
+    def rename(self, tableid, seat, nick):
+        self.write("nick", tableid, seat, nick)
+
+    def close_table(self, tableid):
+        self.write("end", tableid)
+
+    def games(self):
+        """Rebuild the games in the log.  Returns a list of (table id,
+        channel, nicks, game) tuples.  Tables that had not dealt a hand yet
+        are left out."""
+        games = []
+        for tableid in sorted(self.tables):
+            records = self.tables[tableid]
+            if len(records) < 2:
+                continue
+            table, deal = records[:2]
+            seed, button, hands = map(int, deal[2:5])
+            game = TexasHoldemGame(map(int, deal[5:]), int(table[3]))
+            game.buttonLocation = button
+            game.handsPlayed = hands
+            game.newHand(seed=seed)
+            for record in records[2:]:
+                try:
+                    amount = int(record[3]) if len(record) > 3 else None
+                    apply(game, record[2], amount)
+                except (PokerException, KeyError, ValueError):
+                    # the moves after it were made in a different game, so
+                    # they are dropped too
+                    print("Action log record does not fit the game: " +
+                          " ".join(record))
+                    break
+            games.append((tableid, table[2], table[4:], game))
+        return games
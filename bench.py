@@ -0,0 +1,422 @@
+#!/usr/bin/env python2
+# IRC Poker Duel - bench.py
+# Copyright (C) 2014  Daniel Kessler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Rough timings for the slow parts of the bot.
+
+    python2 bench.py [benchmark...]             run all or some benchmarks
+    python2 bench.py --save baseline.json       ...and save the results
+    python2 bench.py --compare baseline.json    ...and compare them to saved
+                                                results
+
+With --compare, results that are worse than the saved ones by more than
+--threshold (a fraction, 0.2 by default) are flagged, and the exit status is
+1 if there are any."""
+
+import argparse
+import copy
+import gc
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+import actionlog
+import equity
+import irc
+import ircproto
+import poker
+import reference
+import verify
+from specialk import TableFile
+from specialk.SevenEval import SevenEval, numpy
+
+# name -> (value, unit) of every result reported so far
+results = {}
+
+def report(name, value, unit):
+    """Print a result and keep it in results.  Units ending in /s are rates,
+    where more is better; for the rest, less is better."""
+    results[name] = (value, unit)
+    print("{:32} {:14.3f} {}".format(name, value, unit))
+
+def timed(fn, *args):
+    """Call fn(*args) and return how many seconds it took."""
+    start = time.time()
+    fn(*args)
+    return time.time() - start
+
+def play_to_river(game):
+    """Deal a preset heads up hand and check it down to the river, stopping
+    right before the action that triggers the showdown."""
+    game.newHand(preset=([("AS","KD"),("QH","QC")],
+                         ["2C","7D","9S","JH","3S"]))
+    game.poker_call()
+    game.poker_check()
+    for i in range(5):
+        game.poker_check()
+
+def bench_showdown(hands=200):
+    game = poker.TexasHoldemGame([1000, 1000], 2)
+
+    # earlier benchmarks have set up the shared evaluator; drop it so that
+    # the first showdown loads the tables, as it does in a fresh process
+    poker.setEvaluator(None)
+    play_to_river(game)
+    cold = timed(game.poker_check)
+
+    warm = 0.0
+    for i in range(hands):
+        play_to_river(game)
+        warm += timed(game.poker_check)
+    warm /= hands
+
+    # Before the evaluator was shared, every showdown built its own SevenEval.
+    rebuild = timed(SevenEval)
+
+    report("showdown, first in process", cold * 1000, "ms")
+    report("showdown, shared evaluator", warm * 1000, "ms")
+    report("showdown, rebuilt evaluator", (rebuild + warm) * 1000, "ms")
+
+def bench_selfplay(hands=2000, players=6):
+    """Players who always call or check, until every hand is shown down."""
+    game = poker.TexasHoldemGame([10 ** 9] * players, 2, random.Random(0))
+    counts = [0, 0]
+
+    def play():
+        for i in xrange(hands):
+            game.newHand()
+            while game.hand_stage != 4:
+                if game.all_show:
+                    game.poker_advance()
+                elif game.current_bet > game.players[game.playerTurn].current_bet:
+                    game.poker_call()
+                else:
+                    game.poker_check()
+                counts[0] += 1
+            counts[1] += 1
+    elapsed = timed(play)
+    report("self-play, actions", counts[0] / elapsed, "actions/s")
+    report("self-play, hands", counts[1] / elapsed, "hands/s")
+
+def bench_load():
+    build = timed(SevenEval)
+    poker.getEvaluator()
+    load = timed(TableFile.load, poker.EVALUATOR_TABLES)
+
+    report("evaluator, built from scratch", build * 1000, "ms")
+    report("evaluator, loaded from file", load * 1000, "ms")
+
+def bench_eval(count=100000):
+    sevenEval = poker.getEvaluator()
+    rng = random.Random(0)
+    hands = [rng.sample(range(52), 7) for i in range(count)]
+
+    def scalar():
+        for hand in hands:
+            sevenEval.getRankOfSeven(*hand)
+    report("getRankOfSeven", count / timed(scalar), "hands/s")
+
+    if numpy != None:
+        array = numpy.array(hands)
+        report("getRanksOfSeven",
+               count / timed(sevenEval.getRanksOfSeven, array), "hands/s")
+
+def bench_workers(samples=400000):
+    hands = [("AH","AS"),("KC","KD"),("9H","10H")]
+    for workers in (1, 2, 4, 8):
+        elapsed = timed(equity.equity, hands, (), samples, 0,
+                        equity.EXACT_LIMIT, workers)
+        report("equity, {} workers".format(workers), samples / elapsed,
+               "runouts/s")
+
+def bench_verify(lowest=20):
+    """Rank every hand of seven of the cards from lowest up, as verify.py
+    does with the whole deck."""
+    hands = equity.choose(52 - lowest, 7)
+    for workers in (1, 2, 4, 8):
+        elapsed = timed(verify.verify, range(lowest, 46), 0, 0, workers)
+        report("verify, {} workers".format(workers), hands / elapsed,
+               "hands/s")
+
+def bench_deal(hands=20000):
+    deck = poker.Deck(random.Random(0))
+
+    def deal():
+        for i in xrange(hands):
+            deck.shuffle()
+            for j in range(9):
+                deck.deal()
+    report("deck, shuffle and deal", hands / timed(deal), "hands/s")
+
+def bench_seats(lookups=200000):
+    seats = [0, 2, 3, 5, 6, 9]
+    ring = poker.SeatRing(seats, 10)
+
+    def scan():
+        for i in xrange(lookups):
+            poker.nextInList(seats, 9, 3)
+
+    def table():
+        for i in xrange(lookups):
+            ring.next(9, 3)
+
+    report("seats, nextInList", lookups / timed(scan), "lookups/s")
+    report("seats, SeatRing", lookups / timed(table), "lookups/s")
+
+def channel_log(count, nicks, rng):
+    """Lines like those a busy channel with duels in it sends: mostly
+    chatter, some PINGs, and commands from the players."""
+    commands = ["!call", "!check", "!hand", "!advance", "!bet 2"]
+    lines = []
+    for i in xrange(count):
+        kind = rng.randint(0, 9)
+        if kind == 0:
+            lines.append("PING :irc.example.net")
+        elif kind < 4:
+            lines.append(":{}!user@host PRIVMSG #duel :{}".format(
+                    rng.choice(nicks), rng.choice(commands)))
+        else:
+            lines.append(":{}!user@host PRIVMSG #duel :{}".format(
+                    rng.choice(nicks), "chatter " * rng.randint(1, 20)))
+    return lines
+
+def bench_parse(count=200000, duels=20):
+    nicks = ["player{}".format(i) for i in range(duels * 2)]
+    log = channel_log(count, nicks + ["watcher"], random.Random(0))
+
+    def parse():
+        for line in log:
+            ircproto.parse(line)
+    report("irc, parse", count / timed(parse), "lines/s")
+
+    irc.ircsend = lambda msg, priority=None: None
+    irc.config = {"nick": "PokerDuel", "init": [],
+                  "channels": ["#duel"], "channelset": set(["#duel"])}
+    for i in range(duels):
+        irc.begin_duel("#duel", nicks[2 * i], nicks[2 * i + 1])
+
+    def dispatch():
+        for line in log:
+            irc.handle_line(line)
+    report("irc, parse and dispatch", count / timed(dispatch), "lines/s")
+
+def bench_actionlog(actions=100000, tables=100):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, "actions.log")
+        # syncs are left to the end, as the bot leaves them to a timer
+        log = actionlog.ActionLog(path, lambda delay, callback: None)
+        game = poker.TexasHoldemGame([1000, 1000], 2)
+        for t in range(tables):
+            log.open_table(t, "#duel", 2, ["alice", "bob"])
+            log.deal(t, game, 0)
+
+        def append():
+            # hands of ten actions, so compaction has something to drop
+            for i in xrange(actions):
+                if i % (tables * 10) < tables:
+                    log.deal(i % tables, game, i)
+                else:
+                    log.act(i % tables, "call")
+        elapsed = timed(append)
+        sync = timed(log.sync)
+        report("action log, append", elapsed / actions * 1e6, "us")
+        report("action log, sync", sync * 1000, "ms")
+        report("action log, compact", timed(log.compact) * 1000, "ms")
+        log.close()
+    finally:
+        shutil.rmtree(tmpdir)
+
+def bench_snapshot(count=20000):
+    game = poker.TexasHoldemGame([1000] * 9, 2, random.Random(0))
+    game.newHand()
+    game.poker_call()
+    game.poker_call()
+
+    def branch():
+        saved = game.snapshot()
+        for i in xrange(count):
+            game.poker_call()
+            game.restore(saved)
+
+    def deepcopies():
+        for i in xrange(count):
+            copy.deepcopy(game).poker_call()
+
+    report("branch, snapshot/restore", timed(branch) / count * 1e6, "us")
+    report("branch, deepcopy", timed(deepcopies) / count * 1e6, "us")
+
+def bench_sidepots(showdowns=20000):
+    # ten players all in for different amounts, with the shortest stacks
+    # holding the best hands, so every side pot has a different winner
+    contributions = [(p, 10 * (p + 1)) for p in range(10)]
+    rankings = [[p] for p in range(10)]
+    for split in (reference.splitPotsBySets, poker.splitPots):
+        def showdown():
+            for i in xrange(showdowns):
+                split(contributions, rankings)
+        report("side pots, " + split.__name__,
+               timed(showdown) / showdowns * 1e6, "us")
+
+def resident_size():
+    """Current resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except IOError:
+        # no procfs; fall back to the peak, which is close enough here
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def table_memory(layout):
+    """Build a SevenEval and return how much resident memory its tables
+    add.  With layout "list" the tables are converted to the Python lists
+    SevenEval used to build, for comparison."""
+    before = resident_size()
+    sevenEval = SevenEval()
+    if layout == "list":
+        for evaluator in (sevenEval, sevenEval.fiveEval):
+            for name, typecode in evaluator.TABLES:
+                setattr(evaluator, name, list(getattr(evaluator, name)))
+    gc.collect()
+    return resident_size() - before
+
+def tables_memory(count):
+    """Start count heads up games and return the resident memory they add
+    per game."""
+    poker.getEvaluator()
+    gc.collect()
+    before = resident_size()
+    games = []
+    for i in xrange(count):
+        game = poker.TexasHoldemGame([35, 35], 2)
+        game.newHand()
+        games.append(game)
+    gc.collect()
+    return (resident_size() - before) // count
+
+def bench_tables():
+    for count in (1000, 10000):
+        size = int(subprocess.check_output(
+                [sys.executable, __file__, "tables", str(count)]))
+        report("tables, {} games".format(count), size, "bytes")
+
+def bench_memory():
+    # each layout is measured in a fresh process so neither sees the other's
+    # freed memory
+    for layout in ("list", "array"):
+        size = int(subprocess.check_output(
+                [sys.executable, __file__, "memory", layout]))
+        report("tables as " + layout, size / 1048576.0, "MiB")
+
+# benchmark name -> function, in the order they run
+BENCHMARKS = OrderedDict([
+    ("memory", bench_memory),
+    ("tables", bench_tables),
+    ("load", bench_load),
+    ("eval", bench_eval),
+    ("workers", bench_workers),
+    ("verify", bench_verify),
+    ("deal", bench_deal),
+    ("seats", bench_seats),
+    ("selfplay", bench_selfplay),
+    ("showdown", bench_showdown),
+    ("parse", bench_parse),
+    ("actionlog", bench_actionlog),
+    ("snapshot", bench_snapshot),
+    ("sidepots", bench_sidepots),
+])
+
+def save(path):
+    with open(path, "w") as baseline:
+        json.dump(dict((name, {"value": value, "unit": unit})
+                       for name, (value, unit) in results.iteritems()),
+                  baseline, indent=1, sort_keys=True)
+
+def load(path):
+    """Read results written by save, as a dict like results."""
+    with open(path) as baseline:
+        return dict((name, (r["value"], r["unit"]))
+                    for name, r in json.load(baseline).iteritems())
+
+def change(old, new, unit):
+    """How much better new is than old, as a fraction: negative if worse."""
+    if old == 0:
+        return 0.0
+    if unit.endswith("/s"):
+        return (new - old) / float(old)
+    return (old - new) / float(old)
+
+def compare(baseline, threshold):
+    """Compare results with baseline.  Returns a (name, baseline value, value
+    now, change, regression) row for each result that has a baseline, where
+    regression says whether it got worse by more than threshold."""
+    rows = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        old, unit = baseline[name]
+        new = results[name][0]
+        difference = change(old, new, unit)
+        rows.append((name, old, new, difference, difference < -threshold))
+    return rows
+
+def print_comparison(rows):
+    print("")
+    print("{:32} {:>14} {:>14} {:>8}".format("", "baseline", "now", "change"))
+    for name, old, new, difference, regression in rows:
+        print("{:32} {:14.3f} {:14.3f} {:+7.1%}{}".format(
+                name, old, new, difference, "  REGRESSION" if regression else ""))
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["memory"]:
+        print(table_memory(sys.argv[2]))
+        sys.exit()
+    if sys.argv[1:2] == ["tables"]:
+        print(tables_memory(int(sys.argv[2])))
+        sys.exit()
+
+    parser = argparse.ArgumentParser(
+            description="Time the slow parts of the bot.")
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+                        help="benchmarks to run (default all): " +
+                             ", ".join(BENCHMARKS))
+    parser.add_argument("--save", metavar="FILE",
+                        help="save the results as JSON")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="compare the results to ones saved with --save")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="how much worse a result may be before it is "
+                             "flagged, as a fraction (default 0.2)")
+    args = parser.parse_args()
+
+    for name in args.benchmarks or BENCHMARKS:
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark " + name)
+        BENCHMARKS[name]()
+
+    if args.save:
+        save(args.save)
+    if args.compare:
+        rows = compare(load(args.compare), args.threshold)
+        print_comparison(rows)
+        sys.exit(1 if any(row[4] for row in rows) else 0)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python2
+# IRC Poker Duel - buildtables.py
+# Copyright (C) 2014  Daniel Kessler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Build the hand evaluator tables and save them for fast start-up.
+
+Usage: python2 buildtables.py [path]
+
+path defaults to the file poker.getEvaluator() loads from."""
+
+import sys
+import time
+
+import poker
+from specialk import TableFile
+from specialk.SevenEval import SevenEval
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else poker.EVALUATOR_TABLES
+
+    start = time.time()
+    sevenEval = SevenEval()
+    print("Built tables in {:.2f} s".format(time.time() - start))
+
+    TableFile.save(path, sevenEval)
+
+    start = time.time()
+    TableFile.load(path)
+    print("Wrote {}; it loads in {:.2f} ms".format(
+            path, (time.time() - start) * 1000))
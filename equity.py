@@ -0,0 +1,193 @@
+# IRC Poker Duel - equity.py
+# Copyright (C) 2014  Daniel Kessler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from itertools import combinations
+from random import Random
+
+import handnames
+from poker import cardToInt, getEvaluator
+from specialk.SevenEval import numpy
+from workers import run as runJobs
+
+# If there are at most this many ways to complete the board, every one of
+# them is evaluated; otherwise the board is completed at random.
+EXACT_LIMIT = 50000
+SAMPLES = 50000
+
+# Runouts are scored in chunks of this many, each of which can go to a
+# different worker process.  Random chunks get their own seeds, drawn from
+# the seed passed to equity, so results do not depend on the worker count.
+CHUNK = 10000
+
+def choose(n, k):
+    result = 1
+    for i in range(k):
+        result = result * (n - i) // (i + 1)
+    return result
+
+def parseCards(cards):
+    """Convert cards to ints, leaving any that already are ints alone."""
+    ints = [c if isinstance(c, int) else cardToInt(c) for c in cards]
+    if any(not 0 <= c < 52 for c in ints):
+        raise ValueError("Invalid card in {}".format(cards))
+    return ints
+
+def makeTasks(hands, board, samples, seed, exact_limit):
+    """Check hands and board as equity does, and split the ways to complete
+    the board into chunks.  Returns a list of (hole card pairs, board,
+    runouts) tasks; see scoreChunk for what runouts may be."""
+    if not 2 <= len(hands) <= 10:
+        raise ValueError("Equity needs between 2 and 10 hands")
+    if len(board) > 5:
+        raise ValueError("The board has at most 5 cards")
+    holes = [parseCards(h) for h in hands]
+    if any(len(h) != 2 for h in holes):
+        raise ValueError("Each hand must have two cards")
+    board = parseCards(board)
+
+    used = set(board)
+    for h in holes:
+        used.update(h)
+    if len(used) != 2 * len(holes) + len(board):
+        raise ValueError("A card appears more than once")
+    deck = [c for c in range(52) if c not in used]
+    missing = 5 - len(board)
+
+    if choose(len(deck), missing) <= exact_limit:
+        runouts = list(combinations(deck, missing))
+        return [(holes, board, runouts[i:i + CHUNK])
+                for i in range(0, len(runouts), CHUNK)]
+    rng = Random(seed)
+    return [(holes, board, (deck, missing, min(CHUNK, samples - i),
+                            rng.getrandbits(64)))
+            for i in range(0, samples, CHUNK)]
+
+def equity(hands, board=(), samples=SAMPLES, seed=None,
+           exact_limit=EXACT_LIMIT, workers=None):
+    """Work out each player's chances of winning, tying and losing.
+
+    hands is a list of 2 to 10 (card, card) tuples and board is a list of 0
+    to 5 community cards, either as ints or as strings in the format of
+    cardToInt, e.g. "10H".  If the
+    board can be completed in at most exact_limit ways, every runout is
+    evaluated; otherwise samples random runouts are drawn using seed.  If
+    workers is given, the work is shared between that many processes.
+
+    Returns a list with a (win, tie, lose) tuple of probabilities for each
+    hand."""
+    tasks = makeTasks(hands, board, samples, seed, exact_limit)
+    counts = [[0, 0, 0] for h in hands]
+    total = 0
+    for chunk in runJobs(scoreChunk, tasks, workers):
+        for count, chunk_count in zip(counts, chunk):
+            for i in range(3):
+                count[i] += chunk_count[i]
+        total += sum(chunk[0])
+    return [tuple(c / float(total) for c in count) for count in counts]
+
+def categories(hands, board=(), samples=SAMPLES, seed=None,
+               exact_limit=EXACT_LIMIT, workers=None):
+    """Work out each player's chances of ending up with each category of
+    hand.  The arguments are the same as for equity.
+
+    Returns a list for each hand with the probability of each of
+    handnames.CATEGORIES."""
+    tasks = makeTasks(hands, board, samples, seed, exact_limit)
+    counts = [[0] * len(handnames.CATEGORIES) for h in hands]
+    for chunk in runJobs(categoryChunk, tasks, workers):
+        for count, chunk_count in zip(counts, chunk):
+            for i, c in enumerate(chunk_count):
+                count[i] += c
+    total = float(sum(counts[0]))
+    return [[c / total for c in count] for count in counts]
+
+def runoutList(runouts):
+    """Return the runouts of a task as a list, drawing them if they are a
+    (deck, missing, samples, seed) tuple."""
+    if isinstance(runouts, tuple):
+        deck, missing, samples, seed = runouts
+        rng = Random(seed)
+        return [rng.sample(deck, missing) for i in xrange(samples)]
+    return runouts
+
+def scoreChunk(task):
+    """Score one chunk of runouts and return tally's counts.  The runouts
+    are either listed, or a (deck, missing, samples, seed) tuple saying how
+    to draw them."""
+    holes, board, runouts = task
+    return tally(score(holes, board, runoutList(runouts)))
+
+def categoryChunk(task):
+    """Score one chunk of runouts and count how many times each player
+    ends up with each category of hand."""
+    holes, board, runouts = task
+    ranks = score(holes, board, runoutList(runouts))
+    lookup = handnames.table()[0]
+    if numpy == None:
+        counts = []
+        for player_ranks in ranks:
+            count = [0] * len(handnames.CATEGORIES)
+            for rank in player_ranks:
+                count[lookup[rank]] += 1
+            counts.append(count)
+        return counts
+
+    lookup = numpy.frombuffer(lookup, dtype=numpy.int8)
+    return [numpy.bincount(lookup[player_ranks],
+                           minlength=len(handnames.CATEGORIES)).tolist()
+            for player_ranks in ranks]
+
+def score(holes, board, runouts):
+    """Return a rank for each hole card pair with each runout: a list per
+    pair, or a (players, runouts) array when numpy is available."""
+    evaluator = getEvaluator()
+    if numpy == None:
+        return [[evaluator.getRankOfSeven(*(hole + board + list(runout)))
+                 for runout in runouts]
+                for hole in holes]
+
+    runouts = numpy.array(runouts, dtype=numpy.intp).reshape(len(runouts), -1)
+    cards = numpy.empty((len(runouts), 7), dtype=numpy.intp)
+    cards[:, 2:2 + len(board)] = board
+    cards[:, 2 + len(board):] = runouts
+    ranks = numpy.empty((len(holes), len(runouts)), dtype=numpy.int32)
+    for i, hole in enumerate(holes):
+        cards[:, :2] = hole
+        ranks[i] = evaluator.getRanksOfSeven(cards)
+    return ranks
+
+def tally(ranks):
+    """Count how many runouts each player wins, ties and loses, given the
+    output of score.  Returns a [win, tie, lose] list for each player."""
+    if numpy == None:
+        counts = [[0, 0, 0] for r in ranks]
+        for runout in zip(*ranks):
+            best = max(runout)
+            winners = runout.count(best)
+            for i, rank in enumerate(runout):
+                if rank != best:
+                    counts[i][2] += 1
+                elif winners == 1:
+                    counts[i][0] += 1
+                else:
+                    counts[i][1] += 1
+        return counts
+
+    winners = ranks == ranks.max(axis=0)
+    shared = winners.sum(axis=0) > 1
+    return map(list, zip((winners & ~shared).sum(axis=1).tolist(),
+                         (winners & shared).sum(axis=1).tolist(),
+                         (~winners).sum(axis=1).tolist()))
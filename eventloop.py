@@ -0,0 +1,135 @@
+# IRC Poker Duel - eventloop.py
+# Copyright (C) 2014  Daniel Kessler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""A small select() based event loop.
+
+Everything that touches the game or the sockets runs on the loop's thread,
+one callback at a time.  Slow work is given to run_in_executor, which runs
+it on a pool of threads and passes the result back to a callback on the
+loop's thread, so the loop keeps answering PINGs and other tables in the
+meantime."""
+
+from multiprocessing.pool import ThreadPool
+from Queue import Queue, Empty
+import heapq
+import os
+import select
+import time
+import traceback
+
+class EventLoop:
+    def __init__(self, executor_threads=2):
+        # fileno -> (file object, callback)
+        self.readers = {}
+        self.writers = {}
+        # heap of (time, sequence number, callback)
+        self.timers = []
+        self.timer_count = 0
+        self.running = False
+
+        self.executor_threads = executor_threads
+        self.executor = None
+        self.completed = Queue()
+        # executor threads write a byte here to wake the loop up
+        self.wakeup_read, self.wakeup_write = os.pipe()
+        self.readers[self.wakeup_read] = (self.wakeup_read, self.run_completed)
+
+    def add_reader(self, f, callback):
+        """Call callback() whenever f has data to read."""
+        self.readers[f.fileno()] = (f, callback)
+
+    def remove_reader(self, f):
+        self.readers.pop(f.fileno(), None)
+
+    def add_writer(self, f, callback):
+        """Call callback() whenever f can be written to."""
+        self.writers[f.fileno()] = (f, callback)
+
+    def remove_writer(self, f):
+        self.writers.pop(f.fileno(), None)
+
+    def call_later(self, delay, callback):
+        """Call callback() after delay seconds."""
+        self.timer_count += 1
+        heapq.heappush(self.timers,
+                       (time.time() + delay, self.timer_count, callback))
+
+    def run_in_executor(self, callback, fn, *args):
+        """Run fn(*args) on an executor thread, then callback(result) on the
+        loop's thread."""
+        if self.executor == None:
+            self.executor = ThreadPool(self.executor_threads)
+        def work():
+            try:
+                return True, fn(*args)
+            except Exception:
+                traceback.print_exc()
+                return False, None
+        def done(outcome):
+            succeeded, result = outcome
+            if succeeded:
+                self.completed.put((callback, result))
+                os.write(self.wakeup_write, "x")
+        self.executor.apply_async(work, callback=done)
+
+    def run_completed(self):
+        os.read(self.wakeup_read, 512)
+        while True:
+            try:
+                callback, result = self.completed.get_nowait()
+            except Empty:
+                return
+            callback(result)
+
+    def run_timers(self):
+        now = time.time()
+        while self.timers and self.timers[0][0] <= now:
+            when, count, callback = heapq.heappop(self.timers)
+            callback()
+
+    def run_once(self, timeout=None):
+        if self.timers:
+            delay = max(0, self.timers[0][0] - time.time())
+            timeout = delay if timeout == None else min(timeout, delay)
+        readable, writable, errors = select.select(
+                self.readers.keys(), self.writers.keys(), [], timeout)
+        for fileno in readable:
+            if fileno in self.readers:
+                self.readers[fileno][1]()
+        for fileno in writable:
+            if fileno in self.writers:
+                self.writers[fileno][1]()
+        self.run_timers()
+
+    def run(self):
+        self.running = True
+        while self.running:
+            self.run_once()
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        """Wait for the executor's jobs to finish, then stop its threads and
+        close the wakeup pipe.  Callbacks of jobs still running are not
+        called, and the loop cannot be run again."""
+        if self.executor != None:
+            self.executor.close()
+            self.executor.join()
+            self.executor = None
+        self.readers.pop(self.wakeup_read, None)
+        os.close(self.wakeup_read)
+        os.close(self.wakeup_write)
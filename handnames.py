@@ -0,0 +1,113 @@
+# IRC Poker Duel - handnames.py
+# Copyright (C) 2014  Daniel Kessler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Names for the ranks the hand evaluator gives, such as "Full house, Kings
+full of Fives".
+
+FiveEval numbers the distinct five card hands from 1, weakest first, by
+going through each category in turn.  buildTable goes through them in the
+same order, so naming a rank is a lookup rather than a look at the cards."""
+
+from array import array
+
+# The categories in the order FiveEval ranks them, weakest first
+CATEGORIES = ["High card", "Pair", "Two pair", "Three of a kind", "Straight",
+              "Flush", "Full house", "Four of a kind", "Straight flush"]
+
+# How many ranks there are, counting every category
+RANKS = 7462
+
+# Faces as FiveEval numbers them, from Two up to Ace
+FACES = ["Two", "Three", "Four", "Five", "Six", "Seven", "Eight", "Nine",
+         "Ten", "Jack", "Queen", "King", "Ace"]
+PLURALS = [face + "s" for face in FACES]
+PLURALS[4] = "Sixes"
+
+# The table is built the first time it is needed
+_table = None
+
+def highCards():
+    """The highest face of every five distinct faces that do not make a
+    straight, in the order FiveEval ranks them."""
+    for i in range(5, 13):
+        for j in range(3, i):
+            for k in range(2, j):
+                for l in range(1, k):
+                    for m in range(0, l):
+                        if not (i - m == 4 or (i == 12 and j == 3 and k == 2 and
+                                               l == 1 and m == 0)):
+                            yield i
+
+def buildTable():
+    """Return (categories, descriptions), each indexed by rank: an array of
+    the index in CATEGORIES of each rank, and a list of descriptions.
+    Index 0 is not a rank."""
+    categories = array("b", [-1])
+    descriptions = [None]
+    def add(category, description):
+        categories.append(category)
+        descriptions.append(description)
+
+    for i in highCards():
+        add(0, "High card, " + FACES[i])
+    for i in range(13):
+        for j in range(2, 13):
+            for k in range(1, j):
+                for l in range(k):
+                    if i != j and i != k and i != l:
+                        add(1, "Pair, " + PLURALS[i])
+    for i in range(1, 13):
+        for j in range(i):
+            for k in range(13):
+                if k != i and k != j:
+                    add(2, "Two pair, {} and {}".format(PLURALS[i], PLURALS[j]))
+    for i in range(13):
+        for j in range(1, 13):
+            for k in range(j):
+                if i != j and i != k:
+                    add(3, "Three of a kind, " + PLURALS[i])
+    # the wheel, A-2-3-4-5, is the lowest straight
+    for i in [3] + range(4, 13):
+        add(4, "Straight, {} high".format(FACES[i]))
+    for i in highCards():
+        add(5, "Flush, {} high".format(FACES[i]))
+    for i in range(13):
+        for j in range(13):
+            if i != j:
+                add(6, "Full house, {} full of {}".format(PLURALS[i], PLURALS[j]))
+    for i in range(13):
+        for j in range(13):
+            if i != j:
+                add(7, "Four of a kind, " + PLURALS[i])
+    for i in [3] + range(4, 12):
+        add(8, "Straight flush, {} high".format(FACES[i]))
+    add(8, "Royal flush")
+    return categories, descriptions
+
+def table():
+    """Return buildTable(), building it the first time."""
+    global _table
+    if _table == None:
+        _table = buildTable()
+    return _table
+
+def category(rank):
+    """Return the index in CATEGORIES of the category of rank."""
+    return table()[0][rank]
+
+def describe(rank):
+    """Return a description of a hand of rank, e.g. "Pair, Jacks"."""
+    return table()[1][rank]
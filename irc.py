@@ -16,127 +16,346 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from collections import defaultdict
-from random import shuffle
+import random
 import socket
+import time
 
+import actionlog
+import equity
+import eventloop
+import handnames
+import ircproto
 import poker
 
 def stripirchost(user):
     return user.split("!",1)[0]
 
-config = {'init':[]}
-with open("config") as configfile:
-    for l in configfile.readlines():
-        split = l[:-1].split("=",1)
-        if split[0] == 'init':
-            config['init'].append(split[1])
-        else:
-            config[split[0]] = split[1]
-
-sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-try:
-    sock.connect((config["server"],int(config["port"])))
-except (socket.error, socket.herror, socket.gaierror):
-    print("Socket error")
-except KeyError:
-    print("You must specify a server and port in the config file!")
-
-def ircsend(msg):
-    global sock
-    sock.send(msg + "\r\n")
-    print("<- "+msg)
-
-def chanmsg(msg):
-    ircsend("PRIVMSG {} :{}".format(config["channel"], msg))
+def readconfig(path="config"):
+    """Read the config file.  init lines are collected into a list, and
+    channel may be a comma separated list of channels to host duels in."""
+    config = {'init':[]}
+    with open(path) as configfile:
+        for l in configfile.readlines():
+            split = l[:-1].split("=",1)
+            if split[0] == 'init':
+                config['init'].append(split[1])
+            else:
+                config[split[0]] = split[1]
+    config['channels'] = config.get('channel', '').split(",")
+    config['channelset'] = set(c.lower() for c in config['channels'])
+    return config
+
+config = None
+sock = None
+
+outqueue = None
+flush_scheduled = False
+
+def ircsend(msg, priority=ircproto.OutQueue.NORMAL):
+    outqueue.put(msg, priority)
+    if not flush_scheduled:
+        flush_outqueue()
+
+def flush_outqueue():
+    """Send what the rate limit allows, and come back for the rest later."""
+    global flush_scheduled
+    flush_scheduled = False
+    for line in outqueue.flush(sock):
+        print("<- "+line)
+    if outqueue.depth():
+        flush_scheduled = True
+        loop.call_later(outqueue.delay(), flush_outqueue)
+
+def chanmsg(channel, msg):
+    ircsend("PRIVMSG {} :{}".format(channel, msg))
 
 def notice_user(nick, msg):
     ircsend("NOTICE {} :{}".format(nick, msg))
 
-def chantopic(topic):
-    ircsend("TOPIC {} :{}".format(config["channel"], topic))
-
-ircsend("USER %s 0 * :%s\r\nNICK %s\r\n" %
-        (config["nick"],config["user"],config["nick"]))
+# The EventLoop running the bot, or None if there is none (e.g. in tests)
+loop = None
 
-# players is a mapping between player id and nick
-players = []
-
-# case insensitive function for getting player id
-def idForPlayer(s):
-    global players
-    for i,p in enumerate(players):
-        if p.lower() == s.lower():
-            return i
-    raise ValueError()
-
-# The PokerGame, if it is in progress
-pokergame=None
-current_stage = -1
-last_all_show = False
+def call_later(delay, callback):
+    """Call callback() after delay seconds, or now if there is no loop."""
+    if loop == None:
+        callback()
+    else:
+        loop.call_later(delay, callback)
+
+class TopicCache:
+    """The topic of each channel.  A topic is only sent if it differs from
+    the one the channel already has, and at most once every interval
+    seconds; a change that comes sooner waits until the interval is over,
+    and is replaced by any change made while it waits."""
+    def __init__(self, send, call_later, interval=2.0, clock=time.time):
+        self.send = send
+        self.call_later = call_later
+        self.interval = interval
+        self.clock = clock
+        # lowercase channel -> the topic it has, when that was sent, and
+        # the topic waiting to be sent
+        self.topics = {}
+        self.last_sent = {}
+        self.pending = {}
+
+        self.sent = 0
+        self.saved = 0
+
+    def seen(self, channel, topic):
+        """Record that channel's topic was set to topic by someone else."""
+        self.topics[channel.lower()] = topic
+
+    def set(self, channel, topic):
+        key = channel.lower()
+        if key in self.pending:
+            # the topic waiting to be sent is replaced without being sent
+            self.pending[key] = (channel, topic)
+            self.saved += 1
+        elif self.topics.get(key) == topic:
+            self.saved += 1
+        else:
+            wait = self.last_sent.get(key, -self.interval) + self.interval - self.clock()
+            self.pending[key] = (channel, topic)
+            if wait > 0:
+                self.call_later(wait, lambda: self.flush(key))
+            else:
+                self.flush(key)
+
+    def flush(self, key):
+        channel, topic = self.pending.pop(key)
+        if self.topics.get(key) == topic:
+            self.saved += 1
+            return
+        self.topics[key] = topic
+        self.last_sent[key] = self.clock()
+        self.sent += 1
+        self.send(channel, topic)
+
+def send_topic(channel, topic):
+    ircsend("TOPIC {} :{}".format(channel, topic))
+
+topics = TopicCache(send_topic, call_later)
+
+def chantopic(channel, topic):
+    topics.set(channel, topic)
+
+def run_slow(callback, fn, *args):
+    """Compute fn(*args) without holding up the bot, then call
+    callback(result)."""
+    if loop == None:
+        callback(fn(*args))
+    else:
+        loop.run_in_executor(callback, fn, *args)
 
 default_topic = "Welcome! To challenge someone, type !challenge playernick"
 
-# listing of open challenges. the key is challengers and the value is opponents
-# everything in this dict should be lowercase
-challenges = defaultdict(lambda: None)
-
-def begin_duel(p1, p2):
-    global pokergame
-    global players
-    pokergame = poker.TexasHoldemGame([35,35], 2)
-    players = [p1, p2]
-
-    pokergame.newHand()
-
-    update_poker()
-
-def update_poker():
-    global current_stage
-    global pokergame
-    global players
-    global last_all_show
+class Table:
+    """A duel in progress: the game, the nicks of its players, and what has
+    already been announced about it."""
+    def __init__(self, tableid, channel, players, game=None):
+        self.tableid = tableid
+        self.channel = channel
+        # players is a mapping between player id and nick
+        self.players = players
+        if game == None:
+            game = poker.TexasHoldemGame([35] * len(players), 2)
+        self.game = game
+        self.current_stage = -1
+        self.last_all_show = False
+        # casefolded nick -> player id
+        self.seats = dict((ircproto.casefold(p), i) for i, p in enumerate(players))
+
+    # case insensitive function for getting player id
+    def idForPlayer(self, s):
+        try:
+            return self.seats[ircproto.casefold(s)]
+        except KeyError:
+            raise ValueError()
+
+    def rename(self, seat, new):
+        del self.seats[ircproto.casefold(self.players[seat])]
+        self.players[seat] = new
+        self.seats[ircproto.casefold(new)] = seat
+
+class TableManager:
+    """Every table in progress.  Tables are indexed by id, by channel, and by
+    the nicks seated at them, so finding the table a message is for takes
+    the same time however many tables there are.  Nicks are compared with
+    ircproto.casefold, as the server compares them."""
+    def __init__(self):
+        self.tables = {}
+        self.byChannel = defaultdict(list)
+        # casefolded nick -> (table, player id)
+        self.byNick = {}
+        self.next_id = 1
+
+    def create(self, channel, players):
+        return self.add(Table(self.next_id, channel, players))
+
+    def add(self, table):
+        self.next_id = max(self.next_id, table.tableid + 1)
+        self.tables[table.tableid] = table
+        self.byChannel[table.channel.lower()].append(table)
+        for i, p in enumerate(table.players):
+            self.byNick[ircproto.casefold(p)] = (table, i)
+        return table
+
+    def remove(self, table):
+        del self.tables[table.tableid]
+        self.byChannel[table.channel.lower()].remove(table)
+        for p in table.players:
+            self.byNick.pop(ircproto.casefold(p), None)
+
+    def seatFor(self, nick):
+        """Return the (table, player id) nick is seated at, or (None, None)."""
+        return self.byNick.get(ircproto.casefold(nick), (None, None))
+
+    def tableFor(self, nick):
+        """Return the table nick is seated at, or None."""
+        return self.seatFor(nick)[0]
+
+    def inChannel(self, channel):
+        return self.byChannel[channel.lower()]
+
+    def rename(self, old, new):
+        """Change a seated player's nick, and return their (table, player
+        id), or (None, None) if old is not seated."""
+        seated = self.byNick.pop(ircproto.casefold(old), None)
+        if seated == None:
+            return None, None
+        table, seat = seated
+        table.rename(seat, new)
+        self.byNick[ircproto.casefold(new)] = seated
+        return seated
+
+tables = TableManager()
+
+# The ActionLog that tables are recorded in, or None
+action_log = None
+
+def deal(table):
+    """Start the next hand at table."""
+    seed = random.getrandbits(64)
+    if action_log != None:
+        action_log.deal(table.tableid, table.game, seed)
+    table.game.newHand(seed=seed)
+
+def log_action(table, action, amount=None):
+    if action_log != None:
+        action_log.act(table.tableid, action, amount)
+
+# listing of open challenges in each channel. the key is challengers and the
+# value is opponents. everything in these dicts should be casefolded
+challenges = defaultdict(lambda: defaultdict(lambda: None))
+
+def tablemsg(table, msg):
+    """Send a message about table to its channel, saying which table it is
+    about if the channel has more than one."""
+    if len(tables.inChannel(table.channel)) > 1:
+        msg = "[table {}] {}".format(table.tableid, msg)
+    chanmsg(table.channel, msg)
+
+def update_topic(channel):
+    """Set the channel topic: the complete game status if the channel has
+    one table, otherwise a summary."""
+    in_channel = tables.inChannel(channel)
+    if not in_channel:
+        chantopic(channel, default_topic)
+    elif len(in_channel) > 1:
+        chantopic(channel, "{} | {} duels in progress".format(
+                default_topic, len(in_channel)))
+    else:
+        table = in_channel[0]
+        pokergame = table.game
+        player_chips = ", ".join(["{}{}{}{} ({})".format("*" if p == pokergame.playerTurn else "",
+                                                         "+" if p in pokergame.playersInHand else "",
+                                                         "@" if p == pokergame.buttonLocation else "",
+                                                         table.players[p],
+                                                         pokergame.players[p].chips)
+                                  for p in pokergame.alivePlayers])
+        potinfo = "Pot: {} chips".format(pokergame.get_current_pot_total())
+        community = "Community cards: " + poker.cardsToString(
+                filter(lambda x: x != None, pokergame.community))
+        chantopic(channel, " | ".join([player_chips,potinfo, community]))
+
+def begin_duel(channel, p1, p2):
+    table = tables.create(channel, [p1, p2])
+    if action_log != None:
+        action_log.open_table(table.tableid, channel, table.game.smallblind,
+                              table.players)
+    deal(table)
+    update_poker(table)
+
+def revealed_hand(pokergame, players, seat):
+    """Show seat's cards, with the name of the best hand they make if every
+    community card was dealt."""
+    hand = pokergame.players[seat].hand
+    message = "{}'s hand: {}".format(players[seat], poker.cardsToString(hand))
+    if None in pokergame.community:
+        return message
+    rank = poker.getEvaluator().getRankOfSeven(*(hand + tuple(pokergame.community)))
+    return "{} ({})".format(message, handnames.describe(rank))
+
+def update_poker(table):
+    pokergame = table.game
+    players = table.players
 
     pnum, committed, currentbet, pstage, all_show = pokergame.getCurrentTurn()
 
-    if current_stage != pstage:
-        current_stage = pstage
+    if table.current_stage != pstage:
+        table.current_stage = pstage
 
-        if current_stage == 0:
+        if pstage == 0:
             # show the players their cards
             for i, p in enumerate(players):
                 hand = pokergame.players[i].hand
-                notice_user(p, "Your hand is {} {}.".format(hand[0], hand[1]))
-        elif current_stage == 1:
+                notice_user(p, "Your hand is {}.".format(
+                        poker.cardsToString(hand)))
+        elif pstage == 1:
             # show the flop
-            chanmsg("Community cards: {}".format(
-                    " ".join(pokergame.community[:3])))
-        elif current_stage == 2:
-            chanmsg("Community cards: {}".format(
-                    " ".join(pokergame.community[:4])))
-        elif current_stage == 3:
-            chanmsg("Community cards: {}".format(
-                    " ".join(pokergame.community)))
-        elif current_stage == 4:
+            tablemsg(table, "Community cards: {}".format(
+                    poker.cardsToString(pokergame.community[:3])))
+        elif pstage == 2:
+            tablemsg(table, "Community cards: {}".format(
+                    poker.cardsToString(pokergame.community[:4])))
+        elif pstage == 3:
+            tablemsg(table, "Community cards: {}".format(
+                    poker.cardsToString(pokergame.community)))
+        elif pstage == 4:
             # reveal cards
-            chanmsg(", ".join(["{}'s hand: {}".format(
-                    players[p], " ".join(pokergame.players[p].hand))
-                for p in pokergame.players_to_reveal]))
+            tablemsg(table, ", ".join([revealed_hand(pokergame, players, p)
+                                       for p in pokergame.players_to_reveal]))
             # reveal winnings
-            chanmsg(", ".join(["{} wins {} chips".format(players[p], c)
-                               for p, c in pokergame.winnings.iteritems()]))
-            chanmsg("If your hand was not shown, you may !reveal your cards. "
-                    "Otherwise, advance to the next hand with !advance.")
+            tablemsg(table, ", ".join([
+                    ("{} wins {} chips" if p in pokergame.playersInHand
+                     else "{} gets {} chips back").format(players[p], c)
+                    for p, c in pokergame.winnings.iteritems()]))
+            tablemsg(table, "If your hand was not shown, you may !reveal your cards. "
+                     "Otherwise, advance to the next hand with !advance.")
 
-            last_all_show = False
+            table.last_all_show = False
 
 
-    if all_show and current_stage != 4:
-        if not last_all_show:
-            chanmsg(", ".join(["{}'s hand: {}".format(
-                    players[p], " ".join(pokergame.players[p].hand))
+    if all_show and pstage != 4:
+        if not table.last_all_show:
+            tablemsg(table, ", ".join(["{}'s hand: {}".format(
+                    players[p], poker.cardsToString(pokergame.players[p].hand))
                 for p in pokergame.playersInHand]))
-            last_all_show = True
-        chanmsg("Anyone in this hand may type !advance to continue")
+            in_hand = pokergame.playersInHand[:]
+            dealt = (pokergame.handsPlayed, pokergame.hand_stage)
+            def announce_odds(odds):
+                if (pokergame.handsPlayed, pokergame.hand_stage) != dealt:
+                    # the hand moved on while the odds were worked out
+                    return
+                tablemsg(table, "Odds: " + ", ".join(["{} {:.1%} win, {:.1%} tie".format(
+                        players[p], win, tie)
+                    for p, (win, tie, lose) in zip(in_hand, odds)]))
+            run_slow(announce_odds, equity.equity,
+                     [pokergame.players[p].hand for p in in_hand],
+                     filter(lambda x: x != None, pokergame.community),
+                     10000)
+            table.last_all_show = True
+        tablemsg(table, "Anyone in this hand may type !advance to continue")
     elif currentbet == 0:
         message = "You may !check, !bet ##, or !fold."
     elif currentbet == committed:
@@ -146,108 +365,219 @@ def update_poker():
         message = ("The bet is {} and you have committed {} chips. "
                    "You may !call, !raiseto ##, or !fold.".format(currentbet,committed))
 
-    if not all_show and current_stage != 4:
-        chanmsg("{}: It is your turn. {}".format(players[pnum], message))
-
-    # channel topic (complete game status)
-    player_chips = ", ".join(["{}{}{}{} ({})".format("*" if p == pnum else "",
-                                                     "+" if p in pokergame.playersInHand else "",
-                                                     "@" if p == pokergame.buttonLocation else "",
-                                                     players[p],
-                                                     pokergame.players[p].chips)
-                              for p in pokergame.alivePlayers])
+    if not all_show and pstage != 4:
+        tablemsg(table, "{}: It is your turn. {}".format(players[pnum], message))
 
     if len(pokergame.alivePlayers) == 1:
-        chanmsg(players[pokergame.alivePlayers[0]] + " wins!")
-        chantopic(default_topic)
-        pokergame = None
-        challenges = {}
+        tablemsg(table, players[pokergame.alivePlayers[0]] + " wins!")
+        tables.remove(table)
+        if action_log != None:
+            action_log.close_table(table.tableid)
+
+    # channel topic (complete game status)
+    update_topic(table.channel)
+
+def challenge(channel, nick, args):
+    """!challenge opponent"""
+    folded = ircproto.casefold(nick)
+    opponent = ircproto.casefold(args[0])
+    open_challenges = challenges[channel.lower()]
+    if tables.tableFor(opponent) != None:
+        chanmsg(channel, "That player is already in a duel.")
+    elif open_challenges[opponent] == folded:
+        chanmsg(channel, "That player has already challenged you!"
+                    " Starting the duel now...")
+        del open_challenges[opponent]
+        begin_duel(channel, opponent, folded)
     else:
-        potinfo = "Pot: {} chips".format(pokergame.get_current_pot_total())
-        community = "Community cards: " + " ".join(filter(lambda x: x, pokergame.community))
-        chantopic(" | ".join([player_chips,potinfo, community]))
-
-
-while (1):
-    for ircline in [l.rstrip("\r") for l in sock.recv(512).split("\n")][:-1]:
-        print("-> "+ircline)
-        if ircline.startswith("PING :"):
-            ircsend("PONG :"+ircline[6:])
-        sirc = ircline[1:].split(" ")
-        if len(sirc) > 3:
-            # welcome message
-            if sirc[1] == "001":
-                ircsend("JOIN "+config["channel"])
-                chantopic(default_topic)
-                for cmd in config["init"]:
-                    ircsend(cmd)
-            if pokergame == None:
-                if sirc[1] == "PRIVMSG":
-                    nick = stripirchost(sirc[0])
-                    if sirc[2] == config["channel"] and len(sirc) >= 5:
-                        # commands that must be entered in the public channel
-                        if sirc[3] == ":!challenge":
-                            if challenges[sirc[4].lower()] == nick.lower():
-                                chanmsg("That player has already challenged you!"
-                                            " Starting the duel now...")
-                                begin_duel(sirc[4].lower(), nick.lower())
-                            else:
-                                challenges[nick.lower()] = sirc[4].lower()
-                                chanmsg("Your oppoenent should type \"!accept {}"
-                                            "\" to start the duel.".format(nick))
-                        elif sirc[3] == ":!accept":
-                            if challenges[sirc[4].lower()] == nick.lower():
-                                chanmsg("Let the games begin! May the best win.")
-                                begin_duel(sirc[4].lower(), nick.lower())
-            else:
-                if sirc[1] == "PRIVMSG":
-                    nick = stripirchost(sirc[0])
-                    turn_nick = players[pokergame.playerTurn]
-                    if nick.lower() == turn_nick:
-                        try:
-                            action_taken = True
-                            print pokergame.hand_stage
-                            if sirc[3] == ":!check":
-                                pokergame.poker_check()
-                            elif sirc[3] == ":!fold":
-                                pokergame.poker_fold()
-                            elif sirc[3] == ":!bet" and len(sirc) >= 5:
-                                pokergame.poker_bet(int(sirc[4]))
-                            elif sirc[3] == ":!call":
-                                pokergame.poker_call()
-                            elif sirc[3] == ":!raiseby" and len(sirc) >= 5:
-                                pokergame.poker_raise_by(int(sirc[4]))
-                            elif sirc[3] == ":!raiseto" and len(sirc) >= 5:
-                                pokergame.poker_raise_to(int(sirc[4]))
-                            elif sirc[3] == ":!allin":
-                                pokergame.poker_allin()
-                            else:
-                                action_taken = False
-
-                            if action_taken:
-                                update_poker()
-                                print pokergame.hand_stage
-
-                        except poker.PokerException as e:
-                            chanmsg("{}: {}".format(nick, e.msg))
-                    try:
-                        if idForPlayer(nick) in pokergame.playersInHand:
-                            if sirc[3] == ":!advance":
-                                print pokergame.hand_stage
-                                pokergame.poker_advance()
-                                print pokergame.hand_stage
-                                update_poker()
-                        elif idForPlayer(nick) in pokergame.alivePlayers:
-                            if sirc[3] == ":!hand":
-                                hand = pokergame.players[idForPlayer(nick)].hand
-                                notice_user(nick, "Your hand is {} {}.".format(hand[0], hand[1]))
-                    except ValueError:
-                        pass
-
-            if sirc[1] == "NICK":
-                if stripirchost(sirc[0]) == config["nick"]:
-                    config["nick"] = sirc[2][1:]
-                try:
-                    players[idForPlayer] = sirc[2][1:]
-                except ValueError:
-                    pass
+        open_challenges[folded] = opponent
+        chanmsg(channel, "Your oppoenent should type \"!accept {}"
+                    "\" to start the duel.".format(nick))
+
+def accept(channel, nick, args):
+    """!accept challenger"""
+    folded = ircproto.casefold(nick)
+    opponent = ircproto.casefold(args[0])
+    open_challenges = challenges[channel.lower()]
+    if (open_challenges[opponent] == folded and
+        tables.tableFor(opponent) == None):
+        chanmsg(channel, "Let the games begin! May the best win.")
+        del open_challenges[opponent]
+        begin_duel(channel, opponent, folded)
+
+# Commands that must be entered in a public channel by someone who is not
+# playing: command -> function(channel, nick, args).  All of them need an
+# argument.
+channel_commands = {
+    "!challenge": challenge,
+    "!accept": accept,
+}
+
+def turn_action(action, needs_amount=False):
+    """Make a table command that makes the move action (see
+    actionlog.apply) if it is the player's turn."""
+    def command(table, seat, nick, args):
+        pokergame = table.game
+        if seat != pokergame.playerTurn:
+            return
+        try:
+            amount = int(args[0]) if needs_amount else None
+            actionlog.apply(pokergame, action, amount)
+        except poker.PokerException as e:
+            tablemsg(table, "{}: {}".format(nick, e.msg))
+            return
+        except (ValueError, IndexError):
+            # the amount was missing or not a number
+            return
+        log_action(table, action, amount)
+        update_poker(table)
+    return command
+
+def advance(table, seat, nick, args):
+    pokergame = table.game
+    if seat not in pokergame.playersInHand:
+        return
+    if pokergame.hand_stage == 4:
+        deal(table)
+    else:
+        try:
+            pokergame.poker_advance()
+        except poker.PokerException as e:
+            # the hand is waiting for someone to act
+            tablemsg(table, "{}: {}".format(nick, e.msg))
+            return
+        log_action(table, "advance")
+    update_poker(table)
+
+def show_hand(table, seat, nick, args):
+    pokergame = table.game
+    if seat not in pokergame.playersInHand and seat in pokergame.alivePlayers:
+        hand = pokergame.players[seat].hand
+        notice_user(nick, "Your hand is {}.".format(poker.cardsToString(hand)))
+
+# Commands from a player seated at a table:
+# command -> function(table, seat, nick, args)
+table_commands = {
+    "!check": turn_action("check"),
+    "!fold": turn_action("fold"),
+    "!bet": turn_action("bet", True),
+    "!call": turn_action("call"),
+    "!raiseby": turn_action("raiseby", True),
+    "!raiseto": turn_action("raiseto", True),
+    "!allin": turn_action("allin"),
+    "!advance": advance,
+    "!hand": show_hand,
+}
+
+def on_ping(prefix, params):
+    ircsend("PONG :"+params[-1], ircproto.OutQueue.URGENT)
+
+def on_welcome(prefix, params):
+    for channel in config["channels"]:
+        ircsend("JOIN "+channel)
+        update_topic(channel)
+    for cmd in config["init"]:
+        ircsend(cmd)
+
+def on_privmsg(prefix, params):
+    if len(params) < 2 or not params[1].startswith("!"):
+        # ordinary chatter
+        return
+    words = params[1].split()
+    command, args = words[0], words[1:]
+    nick = stripirchost(prefix)
+    table, seat = tables.seatFor(nick)
+    if table != None:
+        handler = table_commands.get(command)
+        if handler != None:
+            handler(table, seat, nick, args)
+    elif args and params[0].lower() in config["channelset"]:
+        handler = channel_commands.get(command)
+        if handler != None:
+            handler(params[0], nick, args)
+
+def on_topic(prefix, params):
+    if len(params) == 2:
+        topics.seen(params[0], params[1])
+
+def on_nick(prefix, params):
+    old = stripirchost(prefix)
+    if old == config["nick"]:
+        config["nick"] = params[0]
+    table, seat = tables.rename(old, params[0])
+    if table != None and action_log != None:
+        action_log.rename(table.tableid, seat, params[0])
+
+# IRC command -> function(prefix, params)
+line_handlers = {
+    "PING": on_ping,
+    "001": on_welcome,
+    "PRIVMSG": on_privmsg,
+    "TOPIC": on_topic,
+    "NICK": on_nick,
+}
+
+def handle_line(ircline):
+    prefix, command, params = ircproto.parse(ircline)
+    handler = line_handlers.get(command)
+    if handler != None and params:
+        handler(prefix, params)
+
+def restore_tables():
+    """Seat the tables in the action log again, as they were left."""
+    for tableid, channel, players, game in action_log.games():
+        table = tables.add(Table(tableid, channel, players, game))
+        # the state of the game was announced before the restart
+        table.current_stage = game.hand_stage
+        table.last_all_show = game.all_show
+
+def main():
+    global config
+    global sock
+    global loop
+    global outqueue
+    global action_log
+    config = readconfig()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.connect((config["server"],int(config["port"])))
+    except (socket.error, socket.herror, socket.gaierror):
+        print("Socket error")
+    except KeyError:
+        print("You must specify a server and port in the config file!")
+
+    loop = eventloop.EventLoop()
+    outqueue = ircproto.OutQueue(float(config.get("sendrate", 1)),
+                                 int(config.get("sendburst", 5)))
+
+    action_log = actionlog.ActionLog(config.get("actionlog", "actions.log"),
+                                     call_later, run_slow)
+    restore_tables()
+
+    received = ircproto.LineBuffer()
+    def readable():
+        irclines = received.read_from(sock)
+        if irclines == None:
+            print("Disconnected")
+            loop.stop()
+            return
+        for ircline in irclines:
+            print("-> "+ircline)
+            handle_line(ircline)
+    loop.add_reader(sock, readable)
+
+    # load the hand evaluator now rather than at the first showdown
+    run_slow(lambda evaluator: None, poker.getEvaluator)
+
+    ircsend("USER %s 0 * :%s" % (config["nick"],config["user"]))
+    ircsend("NICK %s" % config["nick"])
+
+    try:
+        loop.run()
+    finally:
+        action_log.close()
+        loop.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# IRC Poker Duel - ircproto.py
+# Copyright (C) 2014  Daniel Kessler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Pieces of the IRC protocol that do not depend on the game."""
+
+from collections import deque
+import string
+import time
+
+# IRC servers treat []\~ as the uppercase forms of {}|^ when comparing
+# nicks and channel names (the rfc1459 casemapping)
+RFC1459 = string.maketrans(string.ascii_uppercase + "[]\\~",
+                           string.ascii_lowercase + "{}|^")
+
+def casefold(name):
+    """Return name in the form used to compare nicks and channel names."""
+    return name.translate(RFC1459)
+
+def parse(line):
+    """Split a line from the server into (prefix, command, params).  prefix
+    is None if the line does not have one.  The trailing parameter, the one
+    after " :" that may contain spaces, is the last of params."""
+    prefix = None
+    if line.startswith(":"):
+        prefix, space, line = line[1:].partition(" ")
+    line, colon, trailing = line.partition(" :")
+    params = line.split()
+    if colon:
+        params.append(trailing)
+    if not params:
+        return prefix, "", []
+    return prefix, params[0], params[1:]
+
+class LineBuffer:
+    """Splits the stream of bytes from the server into lines.  A line that
+    is cut off at the end of a read is kept until the rest of it arrives.
+
+    Reads go straight into one preallocated bytearray through a memoryview,
+    so a busy channel does not allocate a new string for every read."""
+    def __init__(self, size=16384):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        # buffer[start:end] is data that has not been returned as a line yet
+        self.start = 0
+        self.end = 0
+
+    def make_room(self):
+        """Make sure there is space after end, moving the unused data to the
+        front of the buffer, or growing the buffer if it is all one line."""
+        if self.end < len(self.buffer):
+            return
+        if self.start > 0:
+            length = self.end - self.start
+            self.buffer[:length] = self.view[self.start:self.end].tobytes()
+            self.start = 0
+            self.end = length
+        else:
+            # a bytearray cannot be resized while a memoryview of it exists
+            grown = bytearray(len(self.buffer) * 2)
+            grown[:self.end] = self.view[:self.end].tobytes()
+            self.buffer = grown
+            self.view = memoryview(grown)
+
+    def read_from(self, sock):
+        """Read whatever sock has and return the complete lines, or None if
+        the connection was closed."""
+        self.make_room()
+        count = sock.recv_into(self.view[self.end:])
+        if count == 0:
+            return None
+        self.end += count
+        return self.lines()
+
+    def feed(self, data):
+        """Add data as if it had been read, and return the complete lines."""
+        while data:
+            self.make_room()
+            count = min(len(data), len(self.buffer) - self.end)
+            self.view[self.end:self.end + count] = data[:count]
+            self.end += count
+            data = data[count:]
+        return self.lines()
+
+    def lines(self):
+        lines = []
+        while True:
+            newline = self.buffer.find("\n", self.start, self.end)
+            if newline < 0:
+                break
+            lines.append(self.view[self.start:newline].tobytes().rstrip("\r"))
+            self.start = newline + 1
+        if self.start == self.end:
+            self.start = self.end = 0
+        return lines
+
+class OutQueue:
+    """Lines waiting to be sent to the server.
+
+    A token bucket limits sending to burst lines at once and rate lines a
+    second after that, so busy tables do not get the bot kicked for
+    flooding.  Urgent lines, such as PONG, go ahead of everything else.
+    Consecutive PRIVMSGs to the same target are joined into one line while
+    it fits within MAX_LINE, and flush writes everything the bucket allows
+    with a single sendall."""
+    URGENT = 0
+    NORMAL = 1
+
+    # 512 bytes less the CRLF, and room for the prefix the server adds when
+    # it relays the message
+    MAX_LINE = 420
+    SEPARATOR = " | "
+
+    def __init__(self, rate=1.0, burst=5, clock=time.time):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.last_refill = clock()
+        # one queue per priority, of [line, time queued] entries
+        self.queues = (deque(), deque())
+
+        self.sent = 0
+        self.coalesced = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def put(self, line, priority=NORMAL):
+        queue = self.queues[priority]
+        if line.startswith("PRIVMSG ") and " :" in line and queue:
+            last = queue[-1]
+            target, text = line[8:].split(" :", 1)
+            if (last[0].startswith("PRIVMSG {} :".format(target)) and
+                len(last[0]) + len(self.SEPARATOR) + len(text) <= self.MAX_LINE):
+                last[0] += self.SEPARATOR + text
+                self.coalesced += 1
+                return
+        queue.append([line, self.clock()])
+
+    def depth(self):
+        return len(self.queues[0]) + len(self.queues[1])
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def delay(self):
+        """Seconds until the bucket lets another line through."""
+        self.refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def take(self):
+        """Remove and return as many lines as the bucket allows now."""
+        self.refill()
+        lines = []
+        now = self.clock()
+        for queue in self.queues:
+            while queue and self.tokens >= 1:
+                line, queued = queue.popleft()
+                self.tokens -= 1
+                latency = now - queued
+                self.sent += 1
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+                lines.append(line)
+        return lines
+
+    def flush(self, sock):
+        """Send the lines the bucket allows now, and return them."""
+        lines = self.take()
+        if lines:
+            sock.sendall("".join([line + "\r\n" for line in lines]))
+        return lines
+
+    def stats(self):
+        return {"depth": self.depth(),
+                "sent": self.sent,
+                "coalesced": self.coalesced,
+                "mean_latency": self.total_latency / self.sent if self.sent else 0.0,
+                "max_latency": self.max_latency}
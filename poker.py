@@ -16,58 +16,78 @@
 
 from collections import defaultdict
 from itertools import chain, groupby
-from random import choice, shuffle
+from random import Random, choice, shuffle
+import os
+import threading
 
+from specialk import TableFile
 from specialk.SevenEval import SevenEval
 
-def shuffledDeck(randomgen=None):
-    deck = [face+suit
-            for face in (map(str,range(2,11)) + ["J","Q","K","A"])
-            for suit in ["H","D","S","C"]]
-    if randomgen == None:
-        shuffle(deck)
-    else:
-        randomgen.shuffle(deck)
-    return deck
+# Building the SevenEval lookup tables takes several seconds, so a single
+# evaluator is set up the first time one is needed and shared by every game.
+# The tables are saved to EVALUATOR_TABLES, so later processes only have to
+# map the file (see buildtables.py).
+EVALUATOR_TABLES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "specialk", "SevenEval.tables")
+_evaluator = None
+# held while the evaluator is set up, so that two threads asking for it at
+# once (e.g. the bot's warm-up and a showdown) do not both build it and
+# write the same file
+_evaluatorLock = threading.Lock()
+
+def getEvaluator():
+    """Return the process-wide SevenEval. On first use it is loaded from
+    EVALUATOR_TABLES, or built and saved there if that file is missing or
+    stale."""
+    global _evaluator
+    if _evaluator == None:
+        with _evaluatorLock:
+            if _evaluator == None:
+                try:
+                    evaluator = TableFile.load(EVALUATOR_TABLES)
+                except TableFile.TableFileError:
+                    evaluator = SevenEval()
+                    try:
+                        TableFile.save(EVALUATOR_TABLES, evaluator)
+                    except EnvironmentError:
+                        # not being able to cache the tables only costs
+                        # start-up time
+                        pass
+                _evaluator = evaluator
+    return _evaluator
+
+def setEvaluator(evaluator):
+    """Replace the process-wide evaluator, e.g. with a specialk.EvalTrace
+    wrapping getEvaluator() to profile showdowns."""
+    global _evaluator
+    _evaluator = evaluator
+
+# Cards are ints from 0 to 51, indexed the same way as SevenEval: face * 4 +
+# suit, with faces running from ace down to two and suits in the order below.
+# Strings such as "10H" are only used when talking to players.
+FACES = ["A","K","Q","J"] + map(str, range(10, 1, -1))
+SUITS = ["S","H","D","C"]
+CARD_STRINGS = [face + suit for face in FACES for suit in SUITS]
+CARD_INTS = dict((card, i) for i, card in enumerate(CARD_STRINGS))
 
 def cardToInt(cardString):
-    facestr = cardString[:-1]
-    suitstr = cardString[-1]
+    """Return the int for a card string such as "10H", or -1 if it is not a
+    valid card."""
+    return CARD_INTS.get(cardString, -1)
 
-    try:
-        if 2 <= int(facestr) <= 10:
-            face = 14 - int(facestr)
-        else:
-            return -1
-    except ValueError:
-        if facestr == "J":
-            face = 3
-        elif facestr == "Q":
-            face = 2
-        elif facestr == "K":
-            face = 1
-        elif facestr == "A":
-            face = 0
-        else:
-            return -1
+def cardToString(card):
+    return CARD_STRINGS[card]
 
-    if suitstr == "S":
-        suit = 0
-    elif suitstr == "H":
-        suit = 1
-    elif suitstr == "D":
-        suit = 2
-    elif suitstr == "C":
-        suit = 3
-    else:
-        return -1
-
-    return face * 4 + suit
+def cardsToString(cards):
+    """Format cards for display, e.g. "AS 10H"."""
+    return " ".join([CARD_STRINGS[c] for c in cards])
 
 def nextInList(l, current, amount=1):
     listLength = len(l)
-    if amount < 0 or amount >= listLength:
-        amount = amount % listLength
+    if amount < 0 or amount > listLength:
+        # keep at least one step, so that a current that is not in the list
+        # moves to one that is
+        amount = (amount - 1) % listLength + 1
 
     i = iter(l)
     while amount > 0:
@@ -83,6 +103,100 @@ def nextInList(l, current, amount=1):
 
     return current
 
+class SeatRing(object):
+    """The seats in a sorted list of seat numbers, stored as a table giving
+    every seat at the table the next listed seat after it (going round the
+    table), so that finding the next seat does not scan the list."""
+    __slots__ = ("count", "following")
+
+    def __init__(self, seats, totalSeats):
+        self.count = len(seats)
+        self.following = [None] * totalSeats
+        listed = set(seats)
+        following = seats[0]
+        for seat in range(totalSeats - 1, -1, -1):
+            self.following[seat] = following
+            if seat in listed:
+                following = seat
+
+    def next(self, current, amount=1):
+        """Same as nextInList(seats, current, amount)."""
+        if amount < 0 or amount > self.count:
+            amount = (amount - 1) % self.count + 1
+        following = self.following
+        # -1 (no seat yet) is followed by the first seat, like the last seat
+        while amount > 0:
+            current = following[current]
+            amount -= 1
+        return current
+
+    def remove(self, seat):
+        """Take a seat out of the ring, e.g. when that player folds.  Seats
+        that were followed by it are now followed by its successor."""
+        successor = self.following[seat]
+        for s, following in enumerate(self.following):
+            if following == seat:
+                self.following[s] = successor
+        self.count -= 1
+
+def splitPots(contributions, rankings, chooser=choice):
+    """Share out the pot and its side pots.
+
+    contributions is a list of (player, chips put in the pot) for every
+    player at the table, sorted by chips.  rankings lists the players still
+    in the hand from the best hand to the worst, as lists of players who
+    tie.  When a pot does not split evenly, the odd chips are given out one
+    at a time to chooser(winners who have not had one from that pot).  A pot
+    that nobody still in the hand contests, such as the part of a bet that
+    was never called, goes back to the players who put it in.
+
+    Returns a dict of how many chips each winner gets, counting any chips
+    given back to players who have folded.
+
+    Walking from the biggest contribution down, each step adds one player to
+    those contesting the pot below it, so the best ranked contenders are
+    kept up to date without comparing sets."""
+    rank = {}
+    for i, players in enumerate(rankings):
+        for p in players:
+            rank[p] = i
+    unranked = len(rankings)
+
+    winnings = {}
+    best = unranked
+    winners = []
+    count = len(contributions)
+    for k in xrange(count - 1, -1, -1):
+        p, chips = contributions[k]
+        r = rank.get(p, unranked)
+        if r < best:
+            best = r
+            winners = [p]
+        elif r == best and r != unranked:
+            winners.append(p)
+
+        below = contributions[k - 1][1] if k > 0 else 0
+        if chips > below and not winners:
+            # everyone from k on has folded, so each gets their share back
+            for q, c in contributions[k:]:
+                winnings[q] = winnings.get(q, 0) + chips - below
+        elif chips > below:
+            # the pot between below and chips is contested by everyone from
+            # k on
+            split, rem = divmod((chips - below) * (count - k), len(winners))
+            for w in winners:
+                winnings[w] = winnings.get(w, 0) + split
+            if rem != 0:
+                giveOddChips(winnings, winners, rem, chooser)
+    return winnings
+
+def giveOddChips(winnings, winners, count, chooser):
+    winners = list(winners)
+    for i in range(count):
+        lucky = chooser(tuple(winners))
+        winners.remove(lucky)
+        winnings[lucky] = winnings.get(lucky, 0) + 1
+
 class PokerException(Exception):
     pass
 
@@ -127,7 +241,50 @@ class MustBetOrCheck(PokerException):
         self.player = player
         self.msg = "You must bet or check."
 
-class Player:
+# the cards of a new deck, in order
+ORDERED_DECK = bytearray(range(52))
+
+class Deck(object):
+    """The 52 card ints, held in a bytearray.  Cards are dealt by moving a
+    cursor through it instead of removing them, and each hand reshuffles the
+    same bytearray in place."""
+    __slots__ = ("cards", "position", "randomgen")
+
+    def __init__(self, randomgen=None):
+        self.cards = bytearray(ORDERED_DECK)
+        self.position = 0
+        self.randomgen = randomgen
+
+    def shuffle(self, randomgen=None):
+        """Shuffle with randomgen, or with the deck's own generator.  If
+        randomgen is given the cards are put in order first, so the result
+        only depends on randomgen's state."""
+        if randomgen != None:
+            self.cards[:] = ORDERED_DECK
+        else:
+            randomgen = self.randomgen
+        if randomgen == None:
+            shuffle(self.cards)
+        else:
+            randomgen.shuffle(self.cards)
+        self.position = 0
+
+    def preset(self, cards):
+        """Arrange the deck so that cards are dealt first, in order, followed
+        by the rest of the deck."""
+        top = set(cards)
+        self.cards[:] = bytearray(list(cards) +
+                                  [c for c in range(52) if c not in top])
+        self.position = 0
+
+    def deal(self):
+        card = self.cards[self.position]
+        self.position += 1
+        return card
+
+class Player(object):
+    __slots__ = ("chips", "past_bets", "current_bet", "hand")
+
     def __init__(self, startingChips):
         self.chips = startingChips
         self.past_bets = 0
@@ -139,7 +296,17 @@ class Player:
         self.past_bets += self.current_bet
         self.current_bet = 0
 
-class TexasHoldemGame:
+class TexasHoldemGame(object):
+    """A game of no limit hold'em.  Instances use slots rather than a
+    __dict__; a heads up game in progress takes about 2 KiB (see
+    bench_tables in bench.py)."""
+    __slots__ = ("buttonLocation", "totalPlayers", "playerTurn", "smallblind",
+                 "handsPlayed", "winnings", "randomgen", "handRandom", "deck",
+                 "players", "hand_stage", "all_show", "players_to_reveal",
+                 "alivePlayers", "playersInHand", "aliveRing", "inHandRing",
+                 "community", "last_raise_player", "current_bet",
+                 "minimum_raise")
+
     def __init__(self, chipdist, smallblind, randomgen=None):
         self.buttonLocation = -1
         self.totalPlayers = len(chipdist)
@@ -148,6 +315,9 @@ class TexasHoldemGame:
         self.handsPlayed = 0
         self.winnings = {}
         self.randomgen = randomgen
+        # the generator for the current hand's shuffle and odd chips
+        self.handRandom = randomgen
+        self.deck = Deck(randomgen)
 
         self.players = []
         for c in chipdist:
@@ -160,15 +330,18 @@ class TexasHoldemGame:
         # 4 - end of hand
         self.hand_stage = -1
 
-    def newHand(self, preset=None):
+    def newHand(self, preset=None, seed=None):
         """Start a new hand. preset is a tuple of (cards_dealt,community cards).
         Example: preset=([("JH","JC"), ("AS","AC")], ["10D","9C","7H","QD","8D"])
         The cards dealt are assigned to players starting with whoever is to the
         left of the button, moving counter clockwise.  In a heads up scenario,
         the first hand is dealt to the big bilnd, and the second is dealt to
-        the small blind.
+        the small blind.  The preset cards are strings, and are converted
+        with cardToInt.
 
-        If preset is not specified, a randomly shuffled deck is used."""
+        If preset is not specified, a randomly shuffled deck is used.  If
+        seed is given, the shuffle and anything else left to chance in the
+        hand depend only on it, so that the hand can be dealt again."""
 
         # if everyone (or all but one) is all-in, everyone shows their cards,
         # and this variable is turned on
@@ -180,6 +353,8 @@ class TexasHoldemGame:
         self.alivePlayers = filter(lambda x: self.players[x].chips != 0,
                                    range(self.totalPlayers))
         self.playersInHand = self.alivePlayers[:]
+        self.aliveRing = SeatRing(self.alivePlayers, self.totalPlayers)
+        self.inHandRing = SeatRing(self.playersInHand, self.totalPlayers)
 
         # reset community cards
         self.community = [None] * 5
@@ -187,25 +362,30 @@ class TexasHoldemGame:
         # update the blinds
         self.handsPlayed += 1
 
+        if seed != None:
+            self.handRandom = Random(seed)
+        else:
+            self.handRandom = self.randomgen
+
         if preset == None:
-            # shuffle the deck
-            self.deck = shuffledDeck(randomgen=self.randomgen)
+            self.deck.shuffle(self.handRandom if seed != None else None)
         else:
-            self.deck = list(chain(chain.from_iterable(preset[0]), preset[1]))
+            self.deck.preset(map(cardToInt, chain(chain.from_iterable(preset[0]),
+                                                  preset[1])))
 
         # move the button to the next alive player
-        self.buttonLocation = nextInList(self.alivePlayers, self.buttonLocation)
+        self.buttonLocation = self.aliveRing.next(self.buttonLocation)
 
         current_deal = self.buttonLocation
         while(1):
-            current_deal = nextInList(self.alivePlayers, current_deal)
-            self.players[current_deal].hand = (self.deck.pop(0), self.deck.pop(0))
+            current_deal = self.aliveRing.next(current_deal)
+            self.players[current_deal].hand = (self.deck.deal(), self.deck.deal())
             if current_deal == self.buttonLocation:
                 break
 
         if len(self.alivePlayers) > 2:
             self.playerTurn = (
-                    nextInList(self.alivePlayers, self.buttonLocation, 3))
+                    self.aliveRing.next(self.buttonLocation, 3))
             sb = 1
         else:
             # special heads up rules
@@ -213,19 +393,19 @@ class TexasHoldemGame:
             sb = 0
 
         self.transfer_to_pot(
-                nextInList(self.alivePlayers, self.buttonLocation, sb),
+                self.aliveRing.next(self.buttonLocation, sb),
                 self.smallblind)
 
         self.transfer_to_pot(
-                nextInList(self.alivePlayers, self.buttonLocation, sb+1),
+                self.aliveRing.next(self.buttonLocation, sb+1),
                 self.smallblind * 2)
 
         # last_raise_player is the player id of the last person to raise/bet
         # playerTurn rotates around alivePlayers until it gets to this
         # In the pre-flop stage, this is the player after the big blind (three
         # to the left of the button)
-        self.last_raise_player = nextInList(
-                self.alivePlayers, self.buttonLocation, 2+sb)
+        self.last_raise_player = self.aliveRing.next(
+                self.buttonLocation, 2+sb)
 
         # set the stage to 0 (pre-flop)
         self.hand_stage = 0
@@ -241,6 +421,51 @@ class TexasHoldemGame:
         return (self.playerTurn, self.players[self.playerTurn].current_bet,
                self.current_bet, self.hand_stage, self.all_show)
 
+    def snapshot(self):
+        """Return the state of the hand in progress as a tuple, which
+        restore can later return the game to, e.g. to try out several moves
+        from the same position.  The random generators are not included."""
+        players = self.players
+        return (self.hand_stage, self.playerTurn, self.buttonLocation,
+                self.last_raise_player, self.current_bet, self.minimum_raise,
+                self.all_show, self.handsPlayed,
+                tuple([p.chips for p in players]),
+                tuple([p.current_bet for p in players]),
+                tuple([p.past_bets for p in players]),
+                tuple([p.hand for p in players]),
+                tuple(self.community),
+                tuple(self.alivePlayers),
+                tuple(self.playersInHand),
+                tuple(self.players_to_reveal),
+                tuple(self.winnings.iteritems()),
+                tuple(self.aliveRing.following), self.aliveRing.count,
+                tuple(self.inHandRing.following), self.inHandRing.count,
+                str(self.deck.cards), self.deck.position)
+
+    def restore(self, snapshot):
+        """Return the game to a state from snapshot."""
+        (self.hand_stage, self.playerTurn, self.buttonLocation,
+         self.last_raise_player, self.current_bet, self.minimum_raise,
+         self.all_show, self.handsPlayed, chips, current_bets, past_bets,
+         hands, community, alive, inHand, reveal, winnings,
+         aliveFollowing, self.aliveRing.count,
+         inHandFollowing, self.inHandRing.count,
+         cards, self.deck.position) = snapshot
+        for p, c, current, past, hand in zip(self.players, chips, current_bets,
+                                             past_bets, hands):
+            p.chips = c
+            p.current_bet = current
+            p.past_bets = past
+            p.hand = hand
+        self.community[:] = community
+        self.alivePlayers[:] = alive
+        self.playersInHand[:] = inHand
+        self.players_to_reveal[:] = reveal
+        self.winnings = dict(winnings)
+        self.aliveRing.following[:] = aliveFollowing
+        self.inHandRing.following[:] = inHandFollowing
+        self.deck.cards[:] = cards
+
     def get_current_pot_total(self):
         return sum([self.players[p].current_bet + self.players[p].past_bets
                     for p in self.alivePlayers])
@@ -253,10 +478,13 @@ class TexasHoldemGame:
         self.players[playernum].chips -= amount
         self.players[playernum].current_bet += amount
 
-    def rotate_player(self):
-        self.playerTurn = nextInList(self.playersInHand, self.playerTurn)
+    def rotate_player(self, canClose=True):
+        """Move on to the next player, or to the next stage if the betting
+        has come back round to last_raise_player.  With canClose False, the
+        betting stays open even if it has."""
+        self.playerTurn = self.inHandRing.next(self.playerTurn)
         no_contest = len(self.playersInHand) < 2
-        if (self.playerTurn == self.last_raise_player or
+        if ((canClose and self.playerTurn == self.last_raise_player) or
             no_contest or self.all_show):
             # go to the next stage
             for p in self.players:
@@ -264,8 +492,7 @@ class TexasHoldemGame:
 
             self.hand_stage += 1
 
-            self.playerTurn = nextInList(
-                    self.playersInHand, self.buttonLocation)
+            self.playerTurn = self.inHandRing.next(self.buttonLocation)
 
             self.current_bet = 0
             self.minimum_raise = self.smallblind * 2
@@ -274,11 +501,11 @@ class TexasHoldemGame:
             if no_contest:
                 self.hand_stage = 4
             elif not self.all_show and self.hand_stage != 4:
-                # if there are two or more players with chips, do not go into
-                # all_show mode
+                # if there are two or more players in the hand with chips, do
+                # not go into all_show mode
                 players_with_chips = 0
-                for p in self.players:
-                    if p.chips > 0:
+                for p in self.playersInHand:
+                    if self.players[p].chips > 0:
                         players_with_chips += 1
                 if players_with_chips < 2:
                     self.all_show = True
@@ -289,78 +516,51 @@ class TexasHoldemGame:
                     # This process should only be done if we are not in all_show
                     # mode, otherwise it doesn't matter where last_raise_player
                     # is.
-                    while True:
-                        self.last_raise_player = nextInList(
-                                self.playersInHand, self.buttonLocation)
-                        if self.players[self.last_raise_player].chips > 0:
-                            break
+                    self.last_raise_player = self.inHandRing.next(
+                            self.buttonLocation)
+                    while self.players[self.last_raise_player].chips == 0:
+                        self.last_raise_player = self.inHandRing.next(
+                                self.last_raise_player)
+                    # that player is also the first to act
+                    self.playerTurn = self.last_raise_player
 
             if self.hand_stage == 1:
                 # deal the flop
                 for i in range(3):
-                    self.community[i] = self.deck.pop(0)
+                    self.community[i] = self.deck.deal()
             elif self.hand_stage == 2:
                 # deal the turn
-                self.community[3] = self.deck.pop(0)
+                self.community[3] = self.deck.deal()
             elif self.hand_stage == 3:
                 # deal the river
-                self.community[4] = self.deck.pop(0)
+                self.community[4] = self.deck.deal()
             elif self.hand_stage == 4:
                 if not no_contest:
                     # determine the winner
                     handRanksDict = defaultdict(list)
-                    sevenEval = SevenEval()
+                    sevenEval = getEvaluator()
                     for p in self.playersInHand:
-                        intHand = map(cardToInt,
-                                    list(self.players[p].hand) + self.community)
-                        handRank = sevenEval.getRankOfSeven(*intHand)
+                        handRank = sevenEval.getRankOfSeven(
+                                *(self.players[p].hand + tuple(self.community)))
                         handRanksDict[handRank].append(p)
                     hand_ranks = sorted(handRanksDict.iteritems(),
                                         key=lambda x:x[0], reverse=True)
                 else:
                     hand_ranks = [(1, self.playersInHand)]
 
-                # rankings is a list of sets.  rankings[0] is the set of players
-                # tied for first place, and so on.
-                rankings = [set(a[1]) for a in hand_ranks]
-
                 # resolve side pots
-                # each entry of sidepots is a (a,b) tuple. a is the set of
-                # players contesting this side pot.  b is the total amount of
-                # chips in that side pot.
-                sidepots = []
-                last_sidepot = 0
-                last_chipcount = 0
-
                 player_bets = sorted([(p, self.players[p].past_bets)
                                       for p in self.alivePlayers],
                                      key=lambda x: x[1])
-                # sorted_players is the same as self.alivePlayers, but sorted by
-                # whoever placed more chips in the pot.
-                sorted_players = map(lambda x: x[0], player_bets)
-                players_left = len(self.alivePlayers)
-                for p, c in player_bets:
-                    if c > last_chipcount:
-                        sidepots.append((set(sorted_players[-players_left:]),
-                                         (c - last_chipcount) * players_left))
-                        last_chipcount = c
-
-                    players_left -= 1
-
+                def chooser(winners):
+                    # odd chips are given to random players
+                    if self.handRandom == None:
+                        return choice(winners)
+                    return self.handRandom.choice(winners)
                 # winnings is a mapping between players and how much they won
-                self.winnings = defaultdict(int)
-
-                for contenders, prize in sidepots:
-                    for wins in rankings:
-                        pot_winners = contenders.intersection(wins)
-                        if pot_winners:
-                            split, rem = divmod(prize, len(pot_winners))
-                            for p in pot_winners:
-                                self.winnings[p] += split
-                            if rem != 0:
-                                # the odd chip is given to a random player
-                                self.winnings[choice(tuple(pot_winners))] += 1
-                            break
+                self.winnings = splitPots(player_bets,
+                                          [a[1] for a in hand_ranks], chooser)
+
                 # actually award the chips
                 for p, c in self.winnings.iteritems():
                     self.players[p].chips += c
@@ -376,16 +576,17 @@ class TexasHoldemGame:
                 # empty, we stop rotating, and anyone who we didn't pass is not
                 # compelled to show their cards.
                 # If there is only one player left, that player does not have to
-                # reveal their cards.
+                # reveal their cards.  Players who folded but had chips given
+                # back are never passed, so they are left out.
                 if not no_contest or not self.all_show:
-                    winning_players = self.winnings.keys()
+                    winning_players = [p for p in self.winnings
+                                       if p in self.playersInHand]
                     current_player = self.last_raise_player
                     while winning_players:
                         self.players_to_reveal.append(current_player)
                         if current_player in winning_players:
                             winning_players.remove(current_player)
-                        current_player = nextInList(self.playersInHand,
-                                                    current_player)
+                        current_player = self.inHandRing.next(current_player)
                 return
 
         # we skip a player if they are out of chips
@@ -393,7 +594,7 @@ class TexasHoldemGame:
             self.rotate_player()
 
     def poker_check(self):
-        if self.all_show:
+        if self.all_show or self.hand_stage == 4:
             raise NoActionAllowed(self.playerTurn)
         if self.current_bet > self.players[self.playerTurn].current_bet:
             raise MustRespondBet(self.playerTurn)
@@ -401,13 +602,22 @@ class TexasHoldemGame:
             self.rotate_player()
 
     def poker_fold(self):
-        if self.all_show:
+        if self.all_show or self.hand_stage == 4:
             raise NoActionAllowed(self.playerTurn)
-        self.playersInHand.remove(self.playerTurn)
-        self.rotate_player()
+        folded = self.playerTurn
+        self.playersInHand.remove(folded)
+        self.inHandRing.remove(folded)
+        if folded == self.last_raise_player:
+            # The betting would have closed when it came back to this
+            # player, who was first to act.  Now it closes when it comes
+            # back to the next player, after everyone has had a turn.
+            self.last_raise_player = self.inHandRing.next(folded)
+            self.rotate_player(False)
+        else:
+            self.rotate_player()
 
     def poker_bet(self, amount):
-        if self.all_show:
+        if self.all_show or self.hand_stage == 4:
             raise NoActionAllowed(self.playerTurn)
         if self.current_bet != 0:
             raise MustRespondBet(self.playerTurn)
@@ -424,7 +634,7 @@ class TexasHoldemGame:
             self.rotate_player()
 
     def poker_call(self):
-        if self.all_show:
+        if self.all_show or self.hand_stage == 4:
             raise NoActionAllowed(self.playerTurn)
         player_bet = self.players[self.playerTurn].current_bet
         if self.current_bet == player_bet:
@@ -435,7 +645,7 @@ class TexasHoldemGame:
 
     def poker_raise_by(self, amount):
         """Adds an amount to the current bet."""
-        if self.all_show:
+        if self.all_show or self.hand_stage == 4:
             raise NoActionAllowed(self.playerTurn)
         player_chips = self.players[self.playerTurn].chips
         player_cbet = self.players[self.playerTurn].current_bet
@@ -0,0 +1,65 @@
+# IRC Poker Duel - reference.py
+# Copyright (C) 2014  Daniel Kessler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Simple, slow versions of code in poker.py that has been made faster.
+tests.py checks the fast versions against them and bench.py times both."""
+
+from random import choice
+
+import poker
+
+def splitPotsBySets(contributions, rankings, chooser=choice):
+    """Same as poker.splitPots, the way rotate_player shared out the pots
+    before it: by building the set of players contesting each pot and
+    intersecting it with each set of tied players in turn."""
+    # rankings is a list of sets.  rankings[0] is the set of players
+    # tied for first place, and so on.
+    rankings = [set(players) for players in rankings]
+
+    # each entry of sidepots is a (a,b) tuple. a is the set of
+    # players contesting this side pot.  b is the total amount of
+    # chips in that side pot.
+    sidepots = []
+    last_chipcount = 0
+
+    # sorted_players is every player, sorted by whoever placed more chips in
+    # the pot.
+    sorted_players = map(lambda x: x[0], contributions)
+    players_left = len(contributions)
+    for p, c in contributions:
+        if c > last_chipcount:
+            sidepots.append((set(sorted_players[-players_left:]),
+                             (c - last_chipcount) * players_left))
+            last_chipcount = c
+
+        players_left -= 1
+
+    winnings = {}
+    for contenders, prize in sidepots:
+        for wins in rankings:
+            pot_winners = contenders.intersection(wins)
+            if pot_winners:
+                split, rem = divmod(prize, len(pot_winners))
+                for p in pot_winners:
+                    winnings[p] = winnings.get(p, 0) + split
+                if rem != 0:
+                    poker.giveOddChips(winnings, pot_winners, rem, chooser)
+                break
+        else:
+            # nobody still in the hand contests it: give it back
+            for p in contenders:
+                winnings[p] = winnings.get(p, 0) + prize // len(contenders)
+    return winnings
@@ -0,0 +1,235 @@
+#!/usr/bin/env python2
+# IRC Poker Duel - simulate.py
+# Copyright (C) 2014  Daniel Kessler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Play hands between computer players, without IRC, to test the game
+engine and gather statistics.
+
+Usage: python2 simulate.py [--hands N] [--players N] [--strategies LIST]
+                           [--seed N] [--workers N] [--output FILE]
+
+Each seat plays one of the STRATEGIES, taken in turn from the comma
+separated list.  Chips are checked to be conserved after every hand.  When
+only one player has chips left, a new game starts.
+
+The hand history written to --output has one line per hand:
+
+    SEED BUTTON CHIPS MOVES WINNINGS
+
+CHIPS are the stacks before the hand and BUTTON is where the button was
+before it, as in an actionlog deal record, so dealing newHand(seed=SEED) and
+making MOVES with actionlog.apply plays the hand again.  MOVES are comma
+separated, with amounts after a colon (call,bet:4,fold), and WINNINGS are
+seat:chips pairs (0:12,2:6)."""
+
+import argparse
+import os
+import shutil
+import time
+from random import Random
+
+import actionlog
+import poker
+from workers import run as runJobs
+
+# Hands are played in chunks of this many, each of which can go to a
+# different worker process.  Every chunk gets its own seed, drawn from the
+# seed passed to simulate, so results do not depend on the worker count.
+CHUNK = 1000
+
+class ChipsNotConserved(Exception):
+    pass
+
+def passive(game, rng):
+    """Check if possible, otherwise call."""
+    if game.current_bet > game.players[game.playerTurn].current_bet:
+        return "call", None
+    return "check", None
+
+def random_move(game, rng):
+    """Any move, with a random amount.  Moves that are not allowed are
+    replaced by passive ones."""
+    action = rng.choice(["fold", "check", "check", "call", "call", "call",
+                         "bet", "raiseto", "allin"])
+    player = game.players[game.playerTurn]
+    amount = None
+    if action in ("bet", "raiseto"):
+        most = player.chips + player.current_bet
+        amount = rng.randint(min(game.smallblind * 2, most), max(most, 1))
+    return action, amount
+
+def hand_strength(game, seat, rng, samples=50):
+    """Estimate the chance that seat has the best hand, by dealing random
+    hands to the other players and completing the board at random."""
+    hand = list(game.players[seat].hand)
+    board = [c for c in game.community if c != None]
+    used = set(hand + board)
+    deck = [c for c in range(52) if c not in used]
+    opponents = len(game.playersInHand) - 1
+    missing = 5 - len(board)
+    evaluator = poker.getEvaluator()
+
+    wins = 0.0
+    for i in xrange(samples):
+        cards = rng.sample(deck, 2 * opponents + missing)
+        full_board = board + cards[2 * opponents:]
+        mine = evaluator.getRankOfSeven(*(hand + full_board))
+        best = max([evaluator.getRankOfSeven(*(cards[2 * o:2 * o + 2] + full_board))
+                    for o in range(opponents)])
+        if mine > best:
+            wins += 1
+        elif mine == best:
+            wins += 0.5
+    return wins / samples
+
+def equity_move(game, rng):
+    """Bet with a strong hand, call when the pot odds are good enough, and
+    otherwise check or fold."""
+    seat = game.playerTurn
+    player = game.players[seat]
+    strength = hand_strength(game, seat, rng)
+    owed = game.current_bet - player.current_bet
+    pot = game.get_current_pot_total()
+    if strength > 0.75:
+        if game.current_bet == 0:
+            return "bet", max(game.smallblind * 2, pot // 2)
+        return "raiseto", game.current_bet * 2
+    if owed == 0:
+        return "check", None
+    if strength >= owed / float(pot + owed):
+        return "call", None
+    return "fold", None
+
+STRATEGIES = {
+    "call": passive,
+    "random": random_move,
+    "equity": equity_move,
+}
+
+def total_chips(game):
+    return sum(p.chips + p.current_bet + p.past_bets for p in game.players)
+
+def play_hand(game, strategies, seed, rng):
+    """Deal a hand with seed and play it out, with strategies[seat] choosing
+    each seat's moves.  Returns the moves made."""
+    game.newHand(seed=seed)
+    moves = []
+    while game.hand_stage != 4:
+        if game.all_show:
+            move = ("advance", None)
+        else:
+            move = strategies[game.playerTurn](game, rng)
+        try:
+            actionlog.apply(game, *move)
+        except poker.PokerException:
+            move = passive(game, rng)
+            actionlog.apply(game, *move)
+        moves.append(move)
+    return moves
+
+def format_hand(seed, button, chips, moves, winnings):
+    return "{} {} {} {} {}\n".format(
+            seed, button, ",".join(map(str, chips)),
+            ",".join(action if amount == None else
+                     "{}:{}".format(action, amount) for action, amount in moves),
+            ",".join("{}:{}".format(p, c) for p, c in sorted(winnings.iteritems())))
+
+def simulateChunk(task):
+    """Play one chunk of hands.  task is (hands, players, chips, strategy
+    names, seed, history path or None).  Returns (hands, games, moves)."""
+    hands, players, chips, names, seed, path = task
+    rng = Random(seed)
+    strategies = [STRATEGIES[names[i % len(names)]] for i in range(players)]
+    history = open(path, "w") if path != None else None
+    games = 0
+    moves = 0
+    game = None
+    try:
+        for i in xrange(hands):
+            if game == None or len([p for p in game.players if p.chips]) < 2:
+                game = poker.TexasHoldemGame([chips] * players, 1)
+                games += 1
+            before = [p.chips for p in game.players]
+            button = game.buttonLocation
+            hand_seed = rng.getrandbits(64)
+            hand_moves = play_hand(game, strategies, hand_seed, rng)
+            moves += len(hand_moves)
+
+            if (total_chips(game) != chips * players or
+                any(p.chips < 0 for p in game.players)):
+                raise ChipsNotConserved("Hand {} changed the chips from {} to {}".format(
+                        hand_seed, before, [p.chips for p in game.players]))
+            if history != None:
+                history.write(format_hand(hand_seed, button, before, hand_moves,
+                                          game.winnings))
+    finally:
+        if history != None:
+            history.close()
+    return hands, games, moves
+
+def simulate(hands, players=6, chips=200, strategies=("call",), seed=None,
+             workers=None, output=None):
+    """Play hands and return (hands, games, moves).  If output is given, the
+    hand history is written to it; workers write their chunks to separate
+    files, which are joined in order at the end."""
+    rng = Random(seed)
+    tasks = []
+    for start in range(0, hands, CHUNK):
+        path = None if output == None else "{}.part{}".format(output, len(tasks))
+        tasks.append((min(CHUNK, hands - start), players, chips,
+                      list(strategies), rng.getrandbits(64), path))
+
+    totals = [0, 0, 0]
+    for result in runJobs(simulateChunk, tasks, workers):
+        for i in range(3):
+            totals[i] += result[i]
+
+    if output != None:
+        with open(output, "w") as history:
+            for task in tasks:
+                with open(task[-1]) as part:
+                    shutil.copyfileobj(part, history)
+                os.remove(task[-1])
+    return tuple(totals)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+            description="Play hands between computer players.")
+    parser.add_argument("--hands", type=int, default=10000)
+    parser.add_argument("--players", type=int, default=6)
+    parser.add_argument("--chips", type=int, default=200)
+    parser.add_argument("--strategies", default="call,random",
+                        help="comma separated list of: " +
+                             ", ".join(sorted(STRATEGIES)))
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--output", help="file to write the hand history to")
+    args = parser.parse_args()
+
+    strategies = args.strategies.split(",")
+    for name in strategies:
+        if name not in STRATEGIES:
+            parser.error("unknown strategy " + name)
+    if not 2 <= args.players <= 10:
+        parser.error("there must be between 2 and 10 players")
+
+    start = time.time()
+    hands, games, moves = simulate(args.hands, args.players, args.chips,
+                                   strategies, args.seed, args.workers,
+                                   args.output)
+    elapsed = time.time() - start
+    print("Played {} hands in {} games, {} moves, in {:.2f} s: {:.0f} hands/s".format(
+            hands, games, moves, elapsed, hands / elapsed))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+EvalTrace.py
+
+Opt-in instrumentation for SevenEval. An EvalTrace wraps an evaluator and
+counts flush and non-flush lookups and the time spent on each; anything else
+is passed through to the wrapped evaluator, so an EvalTrace can stand in for
+a SevenEval anywhere. An untraced SevenEval pays nothing for this.
+"""
+
+import time
+
+import Constants
+
+class EvalTrace :
+	def __init__(self, evaluator, clock=time.time) :
+		self.evaluator = evaluator
+		self.clock = clock
+		self.reset()
+
+	def reset(self) :
+		self.flushCount = 0
+		self.nonFlushCount = 0
+		self.flushTime = 0.0
+		self.nonFlushTime = 0.0
+		self.batchCount = 0
+		self.batchTime = 0.0
+
+	def isFlush(self, *cards) :
+		KEY = 0
+		for card in cards :
+			KEY += self.evaluator.deckcardsKey[card]
+		return self.evaluator.flushCheck[KEY & Constants.SUIT_BIT_MASK] != Constants.NOT_A_FLUSH
+
+	def getRankOfSeven(self, *cards) :
+		start = self.clock()
+		rank = self.evaluator.getRankOfSeven(*cards)
+		elapsed = self.clock() - start
+
+		if self.isFlush(*cards) :
+			self.flushCount += 1
+			self.flushTime += elapsed
+		else :
+			self.nonFlushCount += 1
+			self.nonFlushTime += elapsed
+		return rank
+
+	def getRanksOfSeven(self, hands) :
+		start = self.clock()
+		ranks = self.evaluator.getRanksOfSeven(hands)
+		self.batchTime += self.clock() - start
+		self.batchCount += len(ranks)
+		return ranks
+
+	def report(self) :
+		"""A one-line summary of the counters."""
+		return ("{} flush lookups in {:.3f} s, {} non-flush lookups in {:.3f} s, "
+				"{} batched lookups in {:.3f} s".format(
+					self.flushCount, self.flushTime,
+					self.nonFlushCount, self.nonFlushTime,
+					self.batchCount, self.batchTime))
+
+	def __getattr__(self, name) :
+		return getattr(self.evaluator, name)
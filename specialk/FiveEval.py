@@ -10,18 +10,32 @@ All rights reserved.
 
 import sys
 import os
+from array import array
 
 import Constants
 
 class FiveEval :
 	
-	def __init__(self) :
+	# The lookup tables and the array typecode each one is saved with.
+	TABLES = (("rankArray", "H"), ("flushRankArray", "H"),
+			  ("deckcardsFace", "i"), ("deckcardsFlush", "H"),
+			  ("deckcardsSuit", "b"))
+	
+	def __init__(self, tables=None) :
+		
+		# Use tables that were built earlier, e.g. loaded by TableFile.
+		if tables is not None :
+			for name, typecode in self.TABLES :
+				setattr(self, name, tables[name])
+			return
 		
-		self.rankArray = [0] * (Constants.MAX_FIVE_NONFLUSH_KEY_INT + 1)
-		self.flushRankArray = [0] * (Constants.MAX_FIVE_FLUSH_KEY_INT + 1)
-		self.deckcardsFace = [0] * Constants.DECK_SIZE
-		self.deckcardsFlush = [0] * Constants.DECK_SIZE
-		self.deckcardsSuit = [0] * Constants.DECK_SIZE
+		# Typed arrays rather than lists, so each slot is stored inline
+		# instead of as a pointer to an int object.
+		self.rankArray = array("H", [0]) * (Constants.MAX_FIVE_NONFLUSH_KEY_INT + 1)
+		self.flushRankArray = array("H", [0]) * (Constants.MAX_FIVE_FLUSH_KEY_INT + 1)
+		self.deckcardsFace = array("i", [0]) * Constants.DECK_SIZE
+		self.deckcardsFlush = array("H", [0]) * Constants.DECK_SIZE
+		self.deckcardsSuit = array("b", [0]) * Constants.DECK_SIZE
 		
 		face = [Constants.TWO_FIVE, Constants.THREE_FIVE, Constants.FOUR_FIVE,
 			 	Constants.FIVE_FIVE, Constants.SIX_FIVE, Constants.SEVEN_FIVE,
@@ -10,18 +10,42 @@ All rights reserved.
 
 import sys
 import os
+from array import array
 
 from FiveEval import *
 import Constants
 
+# numpy is only needed for getRanksOfSeven.
+try :
+	import numpy
+except ImportError :
+	numpy = None
+
 class SevenEval :
-	def __init__(self) :
-		self.rankArray = [0] * Constants.CIRCUMFERENCE_SEVEN
-		self.flushRankArray = [0] * (Constants.MAX_SEVEN_FLUSH_KEY_INT + 1)
-		self.deckcardsKey = [0] * Constants.DECK_SIZE
-		self.deckcardsFlush = [0] * Constants.DECK_SIZE
-		self.deckcardsSuit = [0] * Constants.DECK_SIZE	
-		self.flushCheck = [0] * (Constants.MAX_FLUSH_CHECK_SUM + 1)
+	# The lookup tables and the array typecode each one is saved with.
+	TABLES = (("rankArray", "H"), ("flushRankArray", "H"),
+			  ("deckcardsKey", "i"), ("deckcardsFlush", "H"),
+			  ("deckcardsSuit", "b"), ("flushCheck", "b"))
+
+	def __init__(self, tables=None, fiveEval=None) :
+		# numpy views of the tables, made the first time getRanksOfSeven runs.
+		self.numpyTables = None
+
+		# Use tables that were built earlier, e.g. loaded by TableFile.
+		if tables is not None :
+			for name, typecode in self.TABLES :
+				setattr(self, name, tables[name])
+			self.fiveEval = fiveEval
+			return
+
+		# Typed arrays rather than lists, so each slot is stored inline
+		# instead of as a pointer to an int object.
+		self.rankArray = array("H", [0]) * Constants.CIRCUMFERENCE_SEVEN
+		self.flushRankArray = array("H", [0]) * (Constants.MAX_SEVEN_FLUSH_KEY_INT + 1)
+		self.deckcardsKey = array("i", [0]) * Constants.DECK_SIZE
+		self.deckcardsFlush = array("H", [0]) * Constants.DECK_SIZE
+		self.deckcardsSuit = array("b", [0]) * Constants.DECK_SIZE
+		self.flushCheck = array("b", [0]) * (Constants.MAX_FLUSH_CHECK_SUM + 1)
 		
 		face = [Constants.ACE, Constants.KING, Constants.QUEEN, Constants.JACK, Constants.TEN,
 				Constants.NINE, Constants.EIGHT, Constants.SEVEN, Constants.SIX, Constants.FIVE,
@@ -53,6 +77,7 @@ class SevenEval :
 		count = 0
 		
 		fiveCardEvaluator = FiveEval()
+		self.fiveEval = fiveCardEvaluator
 		
 		# High card.
 		for i in range(1, Constants.NUMBER_OF_FACES) :
@@ -118,7 +143,7 @@ class SevenEval :
 		suits = [Constants.SPADE, Constants.HEART, Constants.DIAMOND, Constants.CLUB]
 
 		# Initialise all entries of flushCheck[] to UNVERIFIED, as yet unchecked.	
-		self.flushCheck = [Constants.UNVERIFIED] * (Constants.MAX_FLUSH_CHECK_SUM + 1)
+		self.flushCheck = array("b", [Constants.UNVERIFIED]) * (Constants.MAX_FLUSH_CHECK_SUM + 1)
 
 		# 7-card flush.
 		for card_1 in range(0, Constants.NUMBER_OF_SUITS) :
@@ -184,7 +209,6 @@ class SevenEval :
 			return rank
 		
 		else :
-			print "flush"
 			# Generate a flush key, and look up the rank.
 			FLUSH_KEY = (self.deckcardsFlush[card_1] if self.deckcardsSuit[card_1] == FLUSH_SUIT else 0) + \
 						(self.deckcardsFlush[card_2] if self.deckcardsSuit[card_2] == FLUSH_SUIT else 0) + \
@@ -193,7 +217,40 @@ class SevenEval :
 						(self.deckcardsFlush[card_5] if self.deckcardsSuit[card_5] == FLUSH_SUIT else 0) + \
 						(self.deckcardsFlush[card_6] if self.deckcardsSuit[card_6] == FLUSH_SUIT else 0) + \
 						(self.deckcardsFlush[card_7] if self.deckcardsSuit[card_7] == FLUSH_SUIT else 0)
-			print FLUSH_KEY
 			return self.flushRankArray[FLUSH_KEY]
 		
-		return -1
\ No newline at end of file
+		return -1
+
+	def getRanksOfSeven(self, hands) :
+		"""Rank many hands at once. hands is an (N, 7) array-like of card
+		indices; returns a numpy array of the N ranks getRankOfSeven would
+		give. The key sums, flush checks and table lookups are all done by
+		numpy, so this is much faster than N calls to getRankOfSeven."""
+		if numpy is None :
+			raise ImportError("getRanksOfSeven requires numpy")
+		if self.numpyTables is None :
+			# frombuffer shares memory with the arrays (or the mapped file).
+			self.numpyTables = dict((name, numpy.frombuffer(getattr(self, name), dtype=typecode))
+									for name, typecode in self.TABLES)
+		tables = self.numpyTables
+
+		hands = numpy.asarray(hands, dtype=numpy.intp).reshape(-1, 7)
+
+		# Create the 7-card hand keys and look up their flush suits.
+		keys = tables["deckcardsKey"][hands].sum(axis=1, dtype=numpy.int64)
+		flushSuits = tables["flushCheck"][keys & Constants.SUIT_BIT_MASK]
+
+		# Non-flush ranks, taking each key modulo the circumference as above.
+		keys >>= Constants.NON_FLUSH_BIT_SHIFT
+		keys[keys >= Constants.CIRCUMFERENCE_SEVEN] -= Constants.CIRCUMFERENCE_SEVEN
+		ranks = tables["rankArray"][keys].astype(numpy.int32)
+
+		# Flush ranks, summing the flush keys of the cards in the flush suit.
+		flushes = flushSuits != Constants.NOT_A_FLUSH
+		if flushes.any() :
+			flushHands = hands[flushes]
+			inSuit = tables["deckcardsSuit"][flushHands] == flushSuits[flushes][:, numpy.newaxis]
+			flushKeys = (tables["deckcardsFlush"][flushHands] * inSuit).sum(axis=1)
+			ranks[flushes] = tables["flushRankArray"][flushKeys]
+
+		return ranks
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+TableFile.py
+
+Saves the SevenEval and FiveEval lookup tables to a binary file, and loads
+them back by mapping the file into memory, so an evaluator is ready in
+milliseconds rather than rebuilt from scratch.
+
+File layout (native byte order):
+	header     magic, version, byte order, crc32 of everything after the
+	           header, number of tables
+	directory  one (name, typecode, length, offset) entry per table
+	payload    the raw table contents, each aligned to 8 bytes
+"""
+
+import ctypes
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+from FiveEval import FiveEval
+from SevenEval import SevenEval
+import Constants
+
+MAGIC = "SKEV"
+VERSION = 1
+BYTE_ORDER = "<" if sys.byteorder == "little" else ">"
+
+HEADER = struct.Struct("=4sIcxxxII")
+ENTRY = struct.Struct("=24scxxxII")
+
+CTYPES = {"b" : ctypes.c_int8, "H" : ctypes.c_uint16, "i" : ctypes.c_int32}
+
+class TableFileError(Exception) :
+	pass
+
+def _tables(sevenEval) :
+	"""List (name, typecode, table) for every table the evaluators need."""
+	tables = []
+	for prefix, evaluator in (("SevenEval.", sevenEval),
+							  ("FiveEval.", sevenEval.fiveEval)) :
+		for name, typecode in evaluator.TABLES :
+			tables.append((prefix + name, typecode, getattr(evaluator, name)))
+	return tables
+
+def save(path, sevenEval) :
+	"""Write the tables of sevenEval (and its FiveEval) to path. The file is
+	written under a temporary name and renamed, so readers never see a
+	partial file."""
+	tables = _tables(sevenEval)
+	offset = HEADER.size + ENTRY.size * len(tables)
+	directory = []
+	payload = []
+	for name, typecode, table in tables :
+		padding = -offset % 8
+		payload.append("\0" * padding)
+		offset += padding
+		if not (isinstance(table, array) and table.typecode == typecode) :
+			table = array(typecode, table)
+		data = table.tostring()
+		directory.append(ENTRY.pack(name, typecode, len(table), offset))
+		payload.append(data)
+		offset += len(data)
+
+	body = "".join(directory + payload)
+	header = HEADER.pack(MAGIC, VERSION, BYTE_ORDER,
+						 zlib.crc32(body) & 0xffffffff, len(tables))
+
+	tmp = path + ".tmp"
+	with open(tmp, "wb") as f :
+		f.write(header)
+		f.write(body)
+	os.rename(tmp, path)
+
+def load(path) :
+	"""Map the table file at path and return a SevenEval backed by it. The
+	tables are ctypes arrays over a copy-on-write mapping, so nothing is
+	copied and processes loading the same file share its pages. Raises
+	TableFileError if the file is missing, from another version, or
+	corrupt."""
+	try :
+		with open(path, "rb") as f :
+			mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+	except (EnvironmentError, ValueError) as e :
+		raise TableFileError("cannot map {}: {}".format(path, e))
+
+	if len(mm) < HEADER.size :
+		raise TableFileError("{} is truncated".format(path))
+	magic, version, byteorder, crc, count = HEADER.unpack_from(mm)
+	if magic != MAGIC or version != VERSION or byteorder != BYTE_ORDER :
+		raise TableFileError("{} is not a version {} table file".format(path, VERSION))
+	if zlib.crc32(buffer(mm, HEADER.size)) & 0xffffffff != crc :
+		raise TableFileError("{} failed its checksum".format(path))
+
+	tables = {}
+	for i in range(count) :
+		name, typecode, length, offset = ENTRY.unpack_from(mm, HEADER.size + i * ENTRY.size)
+		ctype = CTYPES[typecode] * length
+		if offset + ctypes.sizeof(ctype) > len(mm) :
+			raise TableFileError("{} is truncated".format(path))
+		tables[name.rstrip("\0")] = ctype.from_buffer(mm, offset)
+
+	try :
+		fiveEval = FiveEval(dict((name, tables["FiveEval." + name])
+								 for name, typecode in FiveEval.TABLES))
+		sevenEval = SevenEval(dict((name, tables["SevenEval." + name])
+								   for name, typecode in SevenEval.TABLES), fiveEval)
+	except KeyError as e :
+		raise TableFileError("{} has no table {}".format(path, e))
+
+	if len(sevenEval.rankArray) != Constants.CIRCUMFERENCE_SEVEN :
+		raise TableFileError("{} does not match Constants".format(path))
+
+	return sevenEval
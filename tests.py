@@ -15,9 +15,37 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from itertools import combinations
+from StringIO import StringIO
+import copy
+import os
+import random
+import shutil
+import socket
+import sys
+import threading
+import tempfile
+import time
 import unittest
 
+import actionlog
+import bench
+import equity
+import eventloop
+import handnames
+import irc
+import ircproto
 import poker
+import reference
+import simulate
+import verify
+from specialk import TableFile
+from specialk.EvalTrace import EvalTrace
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 class TestHands(unittest.TestCase):
     #def setUp(self):
@@ -106,5 +134,1115 @@ class TestHands(unittest.TestCase):
         self.assertEqual(game.players[1].chips, 28)
         self.assertEqual(game.get_current_pot_total(), 0)
 
+class TestCards(unittest.TestCase):
+    def test_conversions(self):
+        self.assertEqual(poker.cardToInt("AS"), 0)
+        self.assertEqual(poker.cardToInt("10H"), 17)
+        self.assertEqual(poker.cardToInt("2C"), 51)
+        self.assertEqual(poker.cardToInt("1C"), -1)
+        self.assertEqual(poker.cardToInt("AX"), -1)
+        for card in range(52):
+            self.assertEqual(poker.cardToInt(poker.cardToString(card)), card)
+        self.assertEqual(poker.cardsToString([0, 17]), "AS 10H")
+
+    def test_dealsInts(self):
+        game = poker.TexasHoldemGame([10, 10], 1)
+        game.newHand()
+        cards = list(game.players[0].hand) + list(game.players[1].hand)
+        self.assertTrue(all(isinstance(c, int) for c in cards))
+        self.assertEqual(len(set(cards)), 4)
+
+class TestDeck(unittest.TestCase):
+    def test_preset(self):
+        deck = poker.Deck()
+        deck.preset([5, 51, 0])
+        self.assertEqual([deck.deal() for i in range(4)], [5, 51, 0, 1])
+        self.assertEqual(sorted(deck.cards), range(52))
+
+    def test_shuffleIsSeededAndResets(self):
+        first = poker.Deck(random.Random(2))
+        second = poker.Deck(random.Random(2))
+        first.shuffle()
+        second.shuffle()
+        first.deal()
+        self.assertEqual(first.cards, second.cards)
+        self.assertEqual(sorted(first.cards), range(52))
+
+        first.shuffle()
+        self.assertEqual(first.position, 0)
+
+    def test_shuffleWithGenerator(self):
+        first = poker.Deck()
+        second = poker.Deck()
+        first.shuffle()
+        first.shuffle(random.Random(4))
+        second.shuffle(random.Random(4))
+        self.assertEqual(first.cards, second.cards)
+
+class TestSeatRing(unittest.TestCase):
+    def test_matchesNextInList(self):
+        rng = random.Random(5)
+        for i in range(200):
+            total = rng.randint(2, 10)
+            seats = sorted(rng.sample(range(total), rng.randint(1, total)))
+            ring = poker.SeatRing(seats, total)
+            for current in range(-1, total):
+                for amount in range(-2, 12):
+                    self.assertEqual(ring.next(current, amount),
+                                     poker.nextInList(seats, current, amount))
+
+            # fold seats one at a time
+            while len(seats) > 1:
+                seat = rng.choice(seats)
+                seats.remove(seat)
+                ring.remove(seat)
+                for current in range(total):
+                    self.assertEqual(ring.next(current),
+                                     poker.nextInList(seats, current))
+
+    def test_leavesFoldedSeat(self):
+        ring = poker.SeatRing([0, 1], 2)
+        ring.remove(0)
+        self.assertEqual(ring.next(0), 1)
+        self.assertEqual(ring.next(1), 1)
+        self.assertEqual(poker.nextInList([1], 0), 1)
+
+    def test_buttonFoldsHeadsUp(self):
+        game = poker.TexasHoldemGame([35, 35], 2)
+        game.newHand()
+        game.poker_fold()
+        self.assertEqual(game.hand_stage, 4)
+        self.assertEqual(sorted(p.chips for p in game.players), [33, 37])
+        # the hand is over until someone advances
+        self.assertRaises(poker.NoActionAllowed, game.poker_fold)
+        self.assertRaises(poker.NoActionAllowed, game.poker_allin)
+
+    def test_firstToActFolds(self):
+        game = poker.TexasHoldemGame([100, 100, 100], 1)
+        game.newHand()
+        # the player after the big blind folds; the button and the blinds
+        # still get their turns before the flop
+        first = game.playerTurn
+        game.poker_fold()
+        game.poker_call()
+        self.assertEqual(game.hand_stage, 0)
+        game.poker_check()
+        self.assertEqual(game.hand_stage, 1)
+        # on the flop, the first player folds, which ends the hand
+        game.poker_fold()
+        self.assertEqual(game.hand_stage, 4)
+        self.assertNotIn(first, game.playersInHand)
+
+    def test_allInLeftOfButton(self):
+        # the player after the button is all-in before the flop, so the
+        # player after them opens the betting on the flop
+        game = poker.TexasHoldemGame([100, 10, 100], 1)
+        game.newHand()
+        game.poker_call()
+        game.poker_allin()
+        game.poker_call()
+        game.poker_call()
+        self.assertEqual(game.hand_stage, 1)
+        self.assertEqual(game.playerTurn, 2)
+        game.poker_check()
+        self.assertEqual(game.playerTurn, 0)
+        game.poker_check()
+        self.assertEqual(game.hand_stage, 2)
+
+def random_showdown(rng, players):
+    """Random contributions and rankings for splitPots, with all-ins at a
+    few shared levels and some players folded."""
+    levels = [rng.randint(1, 200) for i in range(rng.randint(1, 4))]
+    contributions = sorted([(p, rng.choice(levels)) for p in range(players)],
+                           key=lambda x: x[1])
+    ranked = [p for p, c in contributions if rng.randint(0, 2)]
+    rng.shuffle(ranked)
+    rankings = []
+    for p in ranked:
+        if rankings and rng.randint(0, 2) == 0:
+            rankings[-1].append(p)
+        else:
+            rankings.append([p])
+    return contributions, rankings
+
+class TestSidePots(unittest.TestCase):
+    def test_matchesSets(self):
+        rng = random.Random(13)
+        for i in range(3000):
+            contributions, rankings = random_showdown(rng, rng.randint(2, 10))
+            winnings = poker.splitPots(contributions, rankings, min)
+            self.assertEqual(winnings, reference.splitPotsBySets(
+                                     contributions, rankings, min))
+            self.assertEqual(sum(winnings.values()),
+                             sum(c for p, c in contributions))
+
+    def test_sidePots(self):
+        # player 2 is all in for 10 and has the best hand; 0 and 1 split the
+        # rest, with the odd chip going to the chooser's pick
+        contributions = [(2, 10), (0, 25), (1, 25), (3, 25)]
+        rankings = [[2], [0, 1]]
+        self.assertEqual(poker.splitPots(contributions, rankings, max),
+                         {2: 40, 0: 22, 1: 23})
+
+    def test_severalOddChips(self):
+        # 50 chips between three winners leaves two odd chips
+        contributions = [(p, 10) for p in range(5)]
+        self.assertEqual(poker.splitPots(contributions, [[2, 0, 1]], min),
+                         {0: 17, 1: 17, 2: 16})
+
+    def test_oddChipsInGame(self):
+        # four players all in for 20 tie with the board, a royal flush, and
+        # the blinds fold: the pots of 6 and 5 chips below the big blind
+        # each leave odd chips over
+        game = poker.TexasHoldemGame([20] * 6, 1)
+        game.newHand(preset=([("2C","3D"),("4C","5D"),("6C","7D"),
+                              ("8C","9D"),("2H","3H"),("4H","5H")],
+                             ["AS","KS","QS","JS","10S"]))
+        game.poker_allin()
+        for i in range(3):
+            game.poker_call()
+        game.poker_fold()
+        game.poker_fold()
+        while game.hand_stage != 4:
+            game.poker_advance()
+        self.assertEqual(len(game.winnings), 4)
+        self.assertEqual(sum(game.winnings.values()), 83)
+        self.assertEqual(sum(p.chips for p in game.players), 120)
+
+    def test_uncalledBet(self):
+        # player 1 put in 5 more than anyone still in the hand
+        contributions = [(0, 10), (2, 10), (1, 15)]
+        self.assertEqual(poker.splitPots(contributions, [[2], [0]], min),
+                         {2: 30, 1: 5})
+
+    def test_biggestBetFolds(self):
+        # heads up, the small blind is all in for 1 chip and the big blind
+        # folds: the chip the small blind could not match goes back
+        game = poker.TexasHoldemGame([1, 30], 1)
+        game.newHand()
+        game.poker_call()
+        game.poker_fold()
+        self.assertEqual(game.hand_stage, 4)
+        self.assertEqual(game.winnings, {0: 2, 1: 1})
+        self.assertEqual([p.chips for p in game.players], [2, 29])
+        self.assertEqual(game.players_to_reveal, [0])
+
+class TestSnapshot(unittest.TestCase):
+    def play(self, game, moves, rng):
+        """Make random moves, without starting a new hand."""
+        for i in range(moves):
+            if game.hand_stage == 4:
+                return
+            try:
+                actionlog.apply(game, rng.choice(["check", "call", "fold",
+                                                  "bet", "raiseto", "allin",
+                                                  "advance"]),
+                                rng.randint(1, 40))
+            except poker.PokerException:
+                pass
+
+    def test_restore(self):
+        rng = random.Random(10)
+        for i in range(30):
+            game = poker.TexasHoldemGame([40, 60, 80, 100], 2, random.Random(i))
+            game.newHand()
+            self.play(game, rng.randint(0, 8), rng)
+            saved = game.snapshot()
+            expected = copy.deepcopy(game)
+            self.play(game, 50, rng)
+            if game.hand_stage == 4 and len(game.alivePlayers) > 1:
+                # the next hand replaces the lists and rings
+                game.newHand()
+            game.restore(saved)
+            self.assertEqual(game_state(game), game_state(expected))
+            self.assertEqual(game.snapshot(), saved)
+            self.assertEqual(game.deck.cards, expected.deck.cards)
+            self.assertEqual(game.inHandRing.following,
+                             expected.inHandRing.following)
+
+    def test_branches(self):
+        game = poker.TexasHoldemGame([35, 35], 2, random.Random(12))
+        game.newHand()
+        saved = game.snapshot()
+        game.poker_fold()
+        folded = [p.chips for p in game.players]
+        game.restore(saved)
+        game.poker_call()
+        game.poker_check()
+        self.assertEqual(game.hand_stage, 1)
+        game.restore(saved)
+        game.poker_fold()
+        self.assertEqual([p.chips for p in game.players], folded)
+
+class TestTableFile(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.evaluator = poker.getEvaluator()
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.saved = os.path.join(cls.tmpdir, "saved")
+        TableFile.save(cls.saved, cls.evaluator)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def setUp(self):
+        self.path = os.path.join(self.tmpdir, "tables")
+        shutil.copy(self.saved, self.path)
+
+    def test_roundTrip(self):
+        loaded = TableFile.load(self.path)
+        rng = random.Random(1)
+        for i in range(2000):
+            hand = rng.sample(range(52), 7)
+            self.assertEqual(loaded.getRankOfSeven(*hand),
+                             self.evaluator.getRankOfSeven(*hand))
+            self.assertEqual(loaded.fiveEval.getRankOfFive(*hand[:5]),
+                             self.evaluator.fiveEval.getRankOfFive(*hand[:5]))
+
+    def test_rejectsCorruptFile(self):
+        with open(self.path, "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(chr(ord(last) ^ 1))
+        self.assertRaises(TableFile.TableFileError, TableFile.load, self.path)
+
+    def test_rejectsOtherVersion(self):
+        with open(self.path, "r+b") as f:
+            f.seek(4)
+            f.write(TableFile.struct.pack("=I", TableFile.VERSION + 1))
+        self.assertRaises(TableFile.TableFileError, TableFile.load, self.path)
+
+    def test_rejectsMissingFile(self):
+        self.assertRaises(TableFile.TableFileError, TableFile.load,
+                          os.path.join(self.tmpdir, "missing"))
+
+    def test_loadedOnceByThreads(self):
+        loads = []
+        def load(path):
+            loads.append(path)
+            time.sleep(0.05)
+            return self.evaluator
+        saved = (poker._evaluator, TableFile.load)
+        poker._evaluator = None
+        TableFile.load = load
+        try:
+            threads = [threading.Thread(target=poker.getEvaluator)
+                       for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(len(loads), 1)
+            self.assertTrue(poker._evaluator is self.evaluator)
+        finally:
+            poker._evaluator, TableFile.load = saved
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestBatchEval(unittest.TestCase):
+    def setUp(self):
+        self.evaluator = poker.getEvaluator()
+
+    def assertMatchesScalar(self, hands):
+        ranks = self.evaluator.getRanksOfSeven(hands)
+        self.assertEqual(len(ranks), len(hands))
+        for hand, rank in zip(hands, ranks):
+            self.assertEqual(rank, self.evaluator.getRankOfSeven(*hand))
+
+    def test_random(self):
+        rng = random.Random(4)
+        self.assertMatchesScalar([rng.sample(range(52), 7)
+                                  for i in range(20000)])
+
+    def test_exhaustiveHighCards(self):
+        # every hand from the aces through tens: royal flushes, broadway
+        # straights, quads and full houses
+        self.assertMatchesScalar(list(combinations(range(20), 7)))
+
+    def test_exhaustiveLowCards(self):
+        # every hand from the aces and five through two: wheels and low
+        # flushes
+        self.assertMatchesScalar(list(combinations(range(4) + range(36, 52), 7)))
+
+class TestEvalTrace(unittest.TestCase):
+    def setUp(self):
+        self.evaluator = poker.getEvaluator()
+
+    def tearDown(self):
+        poker.setEvaluator(self.evaluator)
+
+    def test_countsShowdownLookups(self):
+        trace = EvalTrace(self.evaluator)
+        poker.setEvaluator(trace)
+
+        game = poker.TexasHoldemGame([6,34], 2)
+        # player 0 makes a spade flush, player 1 does not
+        game.newHand(preset=([("AH","KD"),("AS","4S")],["9S","10S","2S","6H","QC"]))
+        game.poker_allin()
+        game.poker_call()
+        while game.hand_stage != 4:
+            game.poker_advance()
+
+        self.assertEqual(trace.flushCount, 1)
+        self.assertEqual(trace.nonFlushCount, 1)
+        self.assertEqual(game.players[0].chips, 12)
+
+        trace.reset()
+        self.assertEqual(trace.flushCount, 0)
+
+    def test_passesThrough(self):
+        trace = EvalTrace(self.evaluator)
+        self.assertTrue(trace.rankArray is self.evaluator.rankArray)
+
+class TestEquity(unittest.TestCase):
+    def test_exactOnFlop(self):
+        # aces win only if an ace comes without the last king: 85 of the 990
+        # turn and river pairs
+        odds = equity.equity([("AH","AS"),("KC","KD")], ["2C","7D","KS"])
+        self.assertAlmostEqual(odds[0][0], 85 / 990.0)
+        self.assertAlmostEqual(odds[1][0], 905 / 990.0)
+        self.assertEqual(odds[0][1], 0)
+
+    def test_tie(self):
+        odds = equity.equity([("AH","KS"),("AD","KC")],
+                             ["QH","JD","10S","2C"])
+        self.assertEqual(odds, [(0, 1, 0), (0, 1, 0)])
+
+    def test_withoutNumpy(self):
+        hands = [("AH","AS"),("KC","KD"),("9H","10H")]
+        board = ["2C","7D","8H"]
+        batched = equity.equity(hands, board)
+        saved = equity.numpy
+        equity.numpy = None
+        try:
+            scalar = equity.equity(hands, board)
+        finally:
+            equity.numpy = saved
+        for b, s in zip(batched, scalar):
+            for x, y in zip(b, s):
+                self.assertAlmostEqual(x, y)
+
+    def test_categories(self):
+        # the aces make quads only if the turn and river are the other two
+        odds = equity.categories([("AH","AS"),("KC","KD")], ["2C","7D","KS"])
+        self.assertAlmostEqual(odds[0][7], 1 / 990.0)
+        self.assertAlmostEqual(odds[1][3], 648 / 990.0)
+        for hand in odds:
+            self.assertAlmostEqual(sum(hand), 1)
+
+        saved = equity.numpy
+        equity.numpy = None
+        try:
+            self.assertEqual(equity.categories([("AH","AS"),("KC","KD")],
+                                               ["2C","7D","KS"]), odds)
+        finally:
+            equity.numpy = saved
+
+    def test_monteCarloIsSeeded(self):
+        hands = [("AH","AS"),("KC","KD")]
+        first = equity.equity(hands, samples=2000, seed=7)
+        self.assertEqual(first, equity.equity(hands, samples=2000, seed=7))
+        self.assertAlmostEqual(first[0][0], 0.82, delta=0.05)
+        for odds in first:
+            self.assertAlmostEqual(sum(odds), 1)
+
+    def test_workersDoNotChangeResults(self):
+        hands = [("AH","AS"),("KC","KD"),("9H","10H")]
+        serial = equity.equity(hands, samples=25000, seed=3)
+        self.assertEqual(serial,
+                         equity.equity(hands, samples=25000, seed=3, workers=2))
+
+        board = ["2C","7D"]
+        self.assertEqual(equity.equity(hands, board),
+                         equity.equity(hands, board, workers=3))
+
+    def test_rejectsBadInput(self):
+        self.assertRaises(ValueError, equity.equity,
+                          [("AH","AS"),("AH","KD")])
+        self.assertRaises(ValueError, equity.equity, [("AH","AS")])
+        self.assertRaises(ValueError, equity.equity,
+                          [("AH","AS"),("1H","KD")])
+
+class TestEventLoop(unittest.TestCase):
+    def setUp(self):
+        self.loop = eventloop.EventLoop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_executorCallsBackOnLoopThread(self):
+        results = []
+        def callback(result):
+            results.append((result, threading.current_thread()))
+            self.loop.stop()
+        self.loop.run_in_executor(callback, sum, [1, 2, 3])
+        self.loop.call_later(5, self.loop.stop)
+        self.loop.run()
+        self.assertEqual(results, [(6, threading.current_thread())])
+
+    def test_readerRunsWhileExecutorIsBusy(self):
+        a, b = socket.socketpair()
+        release = threading.Event()
+        lines = []
+        def readable():
+            lines.append(a.recv(512))
+            release.set()
+        self.loop.add_reader(a, readable)
+        self.loop.run_in_executor(lambda r: self.loop.stop(), release.wait, 5)
+        b.send("PING :server")
+        self.loop.run()
+        self.assertEqual(lines, ["PING :server"])
+        a.close()
+        b.close()
+
+    def test_timersRunInOrder(self):
+        calls = []
+        self.loop.call_later(0.02, lambda: calls.append(2))
+        self.loop.call_later(0.01, lambda: calls.append(1))
+        self.loop.call_later(0.03, self.loop.stop)
+        self.loop.run()
+        self.assertEqual(calls, [1, 2])
+
+    def test_close(self):
+        loop = eventloop.EventLoop()
+        loop.run_in_executor(lambda result: None, sum, [1, 2])
+        threads = loop.executor._pool
+        loop.close()
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertRaises(OSError, os.fstat, loop.wakeup_read)
+        self.assertRaises(OSError, os.fstat, loop.wakeup_write)
+
+def busy_channel_log(count, rng):
+    """Lines like those a busy channel sends, of assorted lengths."""
+    lines = []
+    for i in range(count):
+        kind = rng.randint(0, 3)
+        if kind == 0:
+            lines.append("PING :irc.example.net")
+        elif kind == 1:
+            lines.append(":nick{}!user@host PRIVMSG #duel :!call".format(i))
+        else:
+            lines.append(":nick{}!user@host PRIVMSG #duel :{}".format(
+                    i, "chatter " * rng.randint(0, 60)))
+    return lines
+
+class TestLineBuffer(unittest.TestCase):
+    def test_replayInRandomChunks(self):
+        rng = random.Random(6)
+        log = busy_channel_log(2000, rng)
+        stream = "".join(line + "\r\n" for line in log)
+        for size in (16, 512):
+            received = []
+            lines = ircproto.LineBuffer(size)
+            position = 0
+            while position < len(stream):
+                chunk = rng.randint(1, 1500)
+                received.extend(lines.feed(stream[position:position + chunk]))
+                position += chunk
+            self.assertEqual(received, log)
+
+    def test_keepsPartialLine(self):
+        lines = ircproto.LineBuffer()
+        self.assertEqual(lines.feed("PING :a\r\nPRIVMSG #du"), ["PING :a"])
+        self.assertEqual(lines.feed("el :hi\n"), ["PRIVMSG #duel :hi"])
+
+    def test_readFromSocket(self):
+        a, b = socket.socketpair()
+        lines = ircproto.LineBuffer(8)
+        b.sendall("PING :server\r\nPRIV")
+        self.assertEqual(lines.read_from(a), [])
+        self.assertEqual(lines.read_from(a), ["PING :server"])
+        b.sendall("MSG #duel :x\r\n")
+        self.assertEqual(lines.read_from(a), [])
+        self.assertEqual(lines.read_from(a), ["PRIVMSG #duel :x"])
+        b.close()
+        self.assertEqual(lines.read_from(a), None)
+        a.close()
+
+class TestParse(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(ircproto.parse(":nick!user@host PRIVMSG #duel :!bet 5"),
+                         ("nick!user@host", "PRIVMSG", ["#duel", "!bet 5"]))
+        self.assertEqual(ircproto.parse("PING :irc.example.net"),
+                         (None, "PING", ["irc.example.net"]))
+        self.assertEqual(ircproto.parse(":server 001 PokerDuel :Welcome"),
+                         ("server", "001", ["PokerDuel", "Welcome"]))
+        self.assertEqual(ircproto.parse(":server MODE #duel +nt"),
+                         ("server", "MODE", ["#duel", "+nt"]))
+        self.assertEqual(ircproto.parse("PRIVMSG #duel :"),
+                         (None, "PRIVMSG", ["#duel", ""]))
+        self.assertEqual(ircproto.parse(""), (None, "", []))
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestOutQueue(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.queue = ircproto.OutQueue(rate=2.0, burst=3, clock=self.clock)
+
+    def test_rateLimit(self):
+        for i in range(10):
+            self.queue.put("NOTICE nick :{}".format(i))
+        self.assertEqual(len(self.queue.take()), 3)
+        self.assertEqual(self.queue.take(), [])
+        self.assertAlmostEqual(self.queue.delay(), 0.5)
+        self.clock.now += 1
+        self.assertEqual(self.queue.take(), ["NOTICE nick :3", "NOTICE nick :4"])
+        self.clock.now += 100
+        self.assertEqual(len(self.queue.take()), 3)
+        self.assertEqual(self.queue.depth(), 2)
+
+    def test_urgentFirst(self):
+        for i in range(5):
+            self.queue.put("NOTICE nick :{}".format(i))
+        self.queue.put("PONG :server", ircproto.OutQueue.URGENT)
+        self.assertEqual(self.queue.take()[0], "PONG :server")
+
+    def test_coalesce(self):
+        self.queue.put("PRIVMSG #duel :a")
+        self.queue.put("PRIVMSG #duel :b")
+        self.queue.put("PRIVMSG #other :c")
+        self.queue.put("TOPIC #other :d")
+        self.queue.put("PRIVMSG #other :e")
+        self.assertEqual(self.queue.take(), ["PRIVMSG #duel :a | b",
+                                             "PRIVMSG #other :c",
+                                             "TOPIC #other :d"])
+        self.assertEqual(self.queue.stats()["coalesced"], 1)
+
+    def test_coalesceLimit(self):
+        text = "x" * 200
+        for i in range(3):
+            self.queue.put("PRIVMSG #duel :" + text)
+        lines = self.queue.take()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(all(len(l) <= ircproto.OutQueue.MAX_LINE for l in lines))
+
+    def test_latency(self):
+        for i in range(4):
+            self.queue.put("NOTICE nick :{}".format(i))
+        self.queue.take()
+        self.clock.now += 0.5
+        self.queue.take()
+        stats = self.queue.stats()
+        self.assertEqual(stats["sent"], 4)
+        self.assertEqual(stats["depth"], 0)
+        self.assertAlmostEqual(stats["max_latency"], 0.5)
+        self.assertAlmostEqual(stats["mean_latency"], 0.125)
+
+    def test_flush(self):
+        a, b = socket.socketpair()
+        self.queue.put("NICK PokerDuel")
+        self.queue.put("JOIN #duel")
+        self.assertEqual(self.queue.flush(a), ["NICK PokerDuel", "JOIN #duel"])
+        self.assertEqual(b.recv(100), "NICK PokerDuel\r\nJOIN #duel\r\n")
+        a.close()
+        b.close()
+
+class IRCTestCase(unittest.TestCase):
+    """Runs irc.py's handlers with the socket replaced by a list of the
+    lines that would have been sent."""
+    def setUp(self):
+        self.sent = []
+        self.saved = (irc.ircsend, irc.config, irc.tables, irc.topics,
+                      irc.action_log)
+        irc.ircsend = lambda msg, priority=None: self.sent.append(msg)
+        irc.config = {"nick": "PokerDuel", "init": [],
+                      "channels": ["#duel"], "channelset": set(["#duel"])}
+        irc.tables = irc.TableManager()
+        irc.challenges.clear()
+        irc.topics = irc.TopicCache(irc.send_topic, irc.call_later)
+
+    def tearDown(self):
+        (irc.ircsend, irc.config, irc.tables, irc.topics,
+         irc.action_log) = self.saved
+
+    def privmsg(self, nick, text, target="#duel"):
+        irc.handle_line(":{}!user@host PRIVMSG {} :{}".format(nick, target, text))
+
+    def duel(self, p1, p2):
+        self.privmsg(p1, "!challenge " + p2)
+        self.privmsg(p2, "!accept " + p1)
+        return irc.tables.tableFor(p1)
+
+class TestTopicCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.sent = []
+        self.timers = []
+        self.topics = irc.TopicCache(
+                lambda channel, topic: self.sent.append(topic),
+                lambda delay, callback: self.timers.append(callback),
+                clock=self.clock)
+
+    def test_unchanged(self):
+        self.topics.set("#duel", "a")
+        self.topics.set("#DUEL", "a")
+        self.assertEqual(self.sent, ["a"])
+        self.assertEqual((self.topics.sent, self.topics.saved), (1, 1))
+
+    def test_debounce(self):
+        self.topics.set("#duel", "a")
+        self.clock.now += 1
+        self.topics.set("#duel", "b")
+        self.topics.set("#duel", "c")
+        self.topics.set("#other", "d")
+        self.assertEqual(self.sent, ["a", "d"])
+        self.assertEqual(len(self.timers), 1)
+        self.clock.now += 1
+        self.timers.pop()()
+        self.assertEqual(self.sent, ["a", "d", "c"])
+        self.assertEqual(self.topics.saved, 1)
+
+    def test_changedBack(self):
+        self.topics.set("#duel", "a")
+        self.topics.set("#duel", "b")
+        self.topics.set("#duel", "a")
+        self.timers.pop()()
+        self.assertEqual(self.sent, ["a"])
+        self.assertEqual(self.topics.saved, 2)
+
+    def test_seen(self):
+        self.topics.seen("#duel", "a")
+        self.topics.set("#duel", "a")
+        self.assertEqual(self.sent, [])
+
+class TestTables(IRCTestCase):
+    def test_concurrentDuels(self):
+        first = self.duel("alice", "bob")
+        second = self.duel("carol", "dave")
+        self.assertTrue(first is not second)
+        self.assertTrue(irc.tables.tableFor("BOB") is first)
+        self.assertEqual(len(irc.tables.inChannel("#duel")), 2)
+
+        # a player at the second table acts; only that game changes
+        turn = second.players[second.game.playerTurn]
+        del self.sent[:]
+        self.privmsg(turn, "!call")
+        self.assertEqual(second.game.hand_stage, 0)
+        self.assertEqual(first.game.get_current_pot_total(), 6)
+        self.assertEqual(second.game.get_current_pot_total(), 8)
+        self.assertTrue(any(line.startswith("PRIVMSG #duel :[table 2]")
+                            for line in self.sent))
+
+    def test_biggestBetFolds(self):
+        table = self.duel("alice", "bob")
+        table.game = poker.TexasHoldemGame([1, 30], 1)
+        table.game.newHand()
+        del self.sent[:]
+        self.privmsg(table.players[table.game.playerTurn], "!call")
+        self.privmsg(table.players[table.game.playerTurn], "!fold")
+        self.assertEqual(table.game.hand_stage, 4)
+        self.assertEqual(sum(p.chips for p in table.game.players), 31)
+        self.assertTrue(any("{} gets 1 chips back".format(table.players[1])
+                            in line for line in self.sent))
+
+    def test_casemapping(self):
+        self.assertEqual(ircproto.casefold("Alice[]\\~"), "alice{}|^")
+        table = self.duel("alice[away]", "bob")
+        self.assertEqual(irc.tables.seatFor("ALICE{AWAY}"),
+                         (table, table.idForPlayer("alice[away]")))
+
+    def test_renameSeatedPlayer(self):
+        table = self.duel("alice", "bob")
+        seat = table.game.playerTurn
+        old = table.players[seat]
+        irc.handle_line(":{}!user@host NICK :Zed".format(old))
+        self.assertEqual(irc.tables.tableFor(old), None)
+        self.assertEqual(irc.tables.seatFor("zed"), (table, seat))
+        self.assertEqual(table.players[seat], "Zed")
+        # the renamed player can still act
+        self.privmsg("Zed", "!call")
+        self.assertNotEqual(table.game.playerTurn, seat)
+
+    def test_chatterIgnored(self):
+        table = self.duel("alice", "bob")
+        del self.sent[:]
+        self.privmsg(table.players[table.game.playerTurn], "call")
+        self.privmsg("carol", "challenge alice")
+        self.assertEqual(self.sent, [])
+
+    def test_advanceDuringBetting(self):
+        table = self.duel("alice", "bob")
+        self.privmsg(table.players[table.game.playerTurn], "!advance")
+        self.assertEqual(table.game.hand_stage, 0)
+        self.assertTrue(self.sent[-1].startswith("PRIVMSG #duel :"))
+
+    def test_ping(self):
+        irc.handle_line("PING :irc.example.net")
+        self.assertEqual(self.sent, ["PONG :irc.example.net"])
+
+    def test_unknownCommands(self):
+        table = self.duel("alice", "bob")
+        del self.sent[:]
+        self.privmsg(table.players[table.game.playerTurn], "!dance")
+        self.privmsg(table.players[table.game.playerTurn], "!bet")
+        self.privmsg("carol", "!challenge")
+        irc.handle_line(":server 372 PokerDuel :- message of the day")
+        self.assertEqual(self.sent, [])
+
+    def test_cannotChallengeSeatedPlayer(self):
+        self.duel("alice", "bob")
+        self.privmsg("carol", "!challenge alice")
+        self.assertEqual(self.sent[-1],
+                         "PRIVMSG #duel :That player is already in a duel.")
+
+    def test_tableEnds(self):
+        table = self.duel("alice", "bob")
+        while irc.tables.tableFor("alice") is table:
+            game = table.game
+            if game.hand_stage == 4 or game.all_show:
+                self.privmsg(table.players[game.playersInHand[0]], "!advance")
+            else:
+                self.privmsg(table.players[game.playerTurn], "!allin")
+                if game.current_bet:
+                    self.privmsg(table.players[game.playerTurn], "!call")
+        self.assertEqual(irc.tables.inChannel("#duel"), [])
+        self.assertEqual(self.sent[-1], "TOPIC #duel :" + irc.default_topic)
+
+    def test_showdownNamesHands(self):
+        table = self.duel("alice", "bob")
+        game = table.game
+        game.newHand(preset=([("AS","KD"),("QH","QC")],
+                             ["2C","7D","9S","JH","3S"]))
+        while game.hand_stage != 4:
+            player = game.players[game.playerTurn]
+            command = "!call" if game.current_bet > player.current_bet else "!check"
+            self.privmsg(table.players[game.playerTurn], command)
+        reveal = [line for line in self.sent if "'s hand: " in line][-1]
+        self.assertTrue("{}'s hand: AS KD (High card, Ace)".format(
+                table.players[0]) in reveal)
+        self.assertTrue("{}'s hand: QH QC (Pair, Queens)".format(
+                table.players[1]) in reveal)
+
+    def test_staleOddsDropped(self):
+        jobs = []
+        class Loop:
+            def call_later(self, delay, callback):
+                callback()
+            def run_in_executor(self, callback, fn, *args):
+                jobs.append((callback, fn, args))
+        table = self.duel("alice", "bob")
+        game = table.game
+        saved = irc.loop
+        irc.loop = Loop()
+        try:
+            self.privmsg(table.players[game.playerTurn], "!allin")
+            self.privmsg(table.players[game.playerTurn], "!call")
+        finally:
+            irc.loop = saved
+        self.assertTrue(game.all_show)
+        callback, fn, args = jobs[0]
+        odds = fn(*args)
+        callback(odds)
+        self.assertTrue(self.sent[-1].startswith("PRIVMSG #duel :Odds: "))
+
+        # once the flop is out, the odds from before it are not posted
+        self.privmsg(table.players[0], "!advance")
+        del self.sent[:]
+        callback(odds)
+        self.assertEqual(self.sent, [])
+
+    def test_topicOnlySentWhenChanged(self):
+        table = self.duel("alice", "bob")
+        topics = [line for line in self.sent if line.startswith("TOPIC")]
+        self.assertEqual(len(topics), 1)
+        del self.sent[:]
+        irc.update_topic("#duel")
+        self.assertFalse(any(line.startswith("TOPIC") for line in self.sent))
+        self.assertEqual(irc.topics.saved, 1)
+        irc.handle_line(":alice!user@host TOPIC #duel :something else")
+        self.privmsg(table.players[table.game.playerTurn], "!call")
+        self.assertTrue(any(line.startswith("TOPIC") for line in self.sent))
+
+def game_state(game):
+    return (game.hand_stage, game.playerTurn, game.buttonLocation,
+            game.current_bet, game.all_show, game.community,
+            game.playersInHand, game.handsPlayed,
+            [(p.chips, p.current_bet, p.past_bets, p.hand) for p in game.players])
+
+class TestActionLog(IRCTestCase):
+    def setUp(self):
+        IRCTestCase.setUp(self)
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "actions.log")
+
+    def tearDown(self):
+        irc.action_log.close()
+        shutil.rmtree(self.tmpdir)
+        IRCTestCase.tearDown(self)
+
+    def openLog(self, **kwargs):
+        return actionlog.ActionLog(self.path, lambda delay, callback: callback(),
+                                   **kwargs)
+
+    def play(self, commands, rng):
+        """Make random moves at the tables in progress."""
+        choices = ["!call", "!call", "!check", "!check", "!fold", "!bet 2",
+                   "!raiseto 6", "!advance", "!advance"]
+        for i in range(commands):
+            if not irc.tables.tables:
+                return
+            table = rng.choice(irc.tables.tables.values())
+            game = table.game
+            self.privmsg(table.players[game.playerTurn], rng.choice(choices))
+
+    def assertRestored(self):
+        irc.action_log.sync()
+        restored = self.openLog().games()
+        self.assertEqual(sorted(irc.tables.tables), [t[0] for t in restored])
+        for tableid, channel, players, game in restored:
+            table = irc.tables.tables[tableid]
+            self.assertEqual((channel, players), (table.channel, table.players))
+            self.assertEqual(game_state(game), game_state(table.game))
+
+    def test_restore(self):
+        irc.action_log = self.openLog()
+        rng = random.Random(8)
+        self.duel("alice", "bob")
+        self.duel("carol", "dave")
+        self.play(100, rng)
+        irc.handle_line(":carol!user@host NICK :Carol2")
+        for i in range(10):
+            self.play(30, rng)
+            self.assertRestored()
+
+    def test_compact(self):
+        irc.action_log = self.openLog(compact_every=20)
+        self.duel("alice", "bob")
+        self.play(200, random.Random(9))
+        with open(self.path) as logfile:
+            self.assertTrue(len(logfile.readlines()) < 40)
+        self.assertRestored()
+
+    def test_endedTable(self):
+        irc.action_log = self.openLog()
+        table = self.duel("alice", "bob")
+        self.duel("carol", "dave")
+        while irc.tables.tableFor("alice") is table:
+            game = table.game
+            if game.hand_stage == 4 or game.all_show:
+                self.privmsg(table.players[game.playersInHand[0]], "!advance")
+            else:
+                self.privmsg(table.players[game.playerTurn], "!allin")
+                if game.current_bet:
+                    self.privmsg(table.players[game.playerTurn], "!call")
+        self.assertEqual([t[0] for t in self.openLog().games()], [2])
+
+    def test_lostPartialRecord(self):
+        irc.action_log = self.openLog()
+        self.duel("alice", "bob")
+        irc.action_log.sync()
+        with open(self.path, "a") as logfile:
+            logfile.write("act 1 ca")
+        self.assertRestored()
+
+    def test_appendAfterPartialRecord(self):
+        irc.action_log = self.openLog()
+        table = self.duel("alice", "bob")
+        irc.action_log.close()
+        with open(self.path, "a") as logfile:
+            logfile.write("act 1 ca")
+        irc.action_log = self.openLog()
+        self.privmsg(table.players[table.game.playerTurn], "!call")
+        irc.action_log.sync()
+        with open(self.path) as logfile:
+            self.assertEqual(logfile.readlines()[-1], "act 1 call\n")
+        self.assertRestored()
+
+    def test_syncInBackground(self):
+        jobs = []
+        irc.action_log = actionlog.ActionLog(
+                self.path, lambda delay, callback: None,
+                lambda callback, fn, *args: jobs.append((callback, fn, args)))
+        self.duel("alice", "bob")
+        irc.action_log.sync()
+        self.assertEqual(len(jobs), 1)
+        # the file is replaced before the fsync gets to run
+        irc.action_log.compact()
+        callback, fn, args = jobs[0]
+        callback(fn(*args))
+        self.assertRestored()
+
+    def test_badRecordDropped(self):
+        irc.action_log = self.openLog()
+        table = self.duel("alice", "bob")
+        irc.action_log.act(table.tableid, "caact", 1)
+        irc.action_log.act(table.tableid, "call")
+        irc.action_log.sync()
+        saved = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            restored = self.openLog().games()
+            printed = sys.stdout.getvalue()
+        finally:
+            sys.stdout = saved
+        self.assertEqual(game_state(restored[0][3]), game_state(table.game))
+        self.assertEqual(printed, "Action log record does not fit the game: "
+                                  "act 1 caact 1\n")
+
+class TestSimulate(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def history(self, name, hands, **kwargs):
+        path = os.path.join(self.tmpdir, name)
+        simulate.simulate(hands, output=path, **kwargs)
+        with open(path) as history:
+            return history.readlines()
+
+    def test_workersDoNotChangeHistory(self):
+        kwargs = dict(players=4, strategies=("random", "call"), seed=14)
+        self.assertEqual(self.history("one", 2500, **kwargs),
+                         self.history("two", 2500, workers=2, **kwargs))
+
+    def test_replayHistory(self):
+        lines = self.history("history", 300, players=5, chips=50, seed=15,
+                             strategies=("random", "call", "equity"))
+        self.assertEqual(len(lines), 300)
+        for line in lines:
+            seed, button, chips, moves, winnings = line.split()
+            game = poker.TexasHoldemGame(map(int, chips.split(",")), 1)
+            game.buttonLocation = int(button)
+            game.newHand(seed=int(seed))
+            for move in moves.split(","):
+                action, colon, amount = move.partition(":")
+                actionlog.apply(game, action, int(amount) if amount else None)
+            self.assertEqual(game.hand_stage, 4)
+            self.assertEqual(simulate.format_hand(seed, button, chips.split(","),
+                                                  [], game.winnings).split()[-1],
+                             winnings)
+
+class TestHandNames(unittest.TestCase):
+    def describe(self, cards):
+        return handnames.describe(poker.getEvaluator().getRankOfSeven(
+                *[poker.cardToInt(c) for c in cards.split()]))
+
+    def test_describe(self):
+        self.assertEqual(self.describe("KS KD KH 5C 5D 2S 3H"),
+                         "Full house, Kings full of Fives")
+        self.assertEqual(self.describe("AS 2D 3C 4H 5S 9D JC"),
+                         "Straight, Five high")
+        self.assertEqual(self.describe("AS AD 7C 7H 5S 5D 2C"),
+                         "Two pair, Aces and Sevens")
+        self.assertEqual(self.describe("6S 6D 6C 9H 2S JD 4C"),
+                         "Three of a kind, Sixes")
+        self.assertEqual(self.describe("AS KS QS JS 10S 2D 3C"), "Royal flush")
+        self.assertEqual(self.describe("9H 8H 7H 6H 5H 4H 4D"),
+                         "Straight flush, Nine high")
+
+    def test_categoriesMatchCards(self):
+        """Work out the category of random five card hands from their
+        cards, and compare it with the table."""
+        evaluator = poker.getEvaluator()
+        rng = random.Random(3)
+        for i in range(3000):
+            cards = rng.sample(range(52), 5)
+            # cards are numbered from the aces down, four to a face
+            faces = sorted(12 - c // 4 for c in cards)
+            counts = sorted([faces.count(f) for f in set(faces)], reverse=True)
+            flush = len(set(c % 4 for c in cards)) == 1
+            straight = (len(set(faces)) == 5 and
+                        (faces[4] - faces[0] == 4 or faces == [0, 1, 2, 3, 12]))
+            if straight and flush:
+                expected = "Straight flush"
+            elif counts[0] == 4:
+                expected = "Four of a kind"
+            elif counts[:2] == [3, 2]:
+                expected = "Full house"
+            elif flush:
+                expected = "Flush"
+            elif straight:
+                expected = "Straight"
+            elif counts[0] == 3:
+                expected = "Three of a kind"
+            elif counts[:2] == [2, 2]:
+                expected = "Two pair"
+            elif counts[0] == 2:
+                expected = "Pair"
+            else:
+                expected = "High card"
+            rank = evaluator.fiveEval.getRankOfFive(*cards)
+            self.assertEqual(handnames.CATEGORIES[handnames.category(rank)],
+                             expected)
+
+    def test_table(self):
+        categories, descriptions = handnames.table()
+        self.assertEqual(len(descriptions), handnames.RANKS + 1)
+        self.assertEqual([list(categories).count(i) for i in range(9)],
+                         [1277, 2860, 858, 858, 10, 1277, 156, 156, 10])
+        self.assertEqual(list(categories[1:]), sorted(categories[1:]))
+
+class TestVerify(unittest.TestCase):
+    def test_chunkMatchesFiveEval(self):
+        fiveEval = poker.getEvaluator().fiveEval
+        expected = [0] * (handnames.RANKS + 1)
+        for rest in combinations(range(41, 52), 5):
+            expected[fiveEval.getRankOfSeven(39, 40, *rest)] += 1
+        task = (39, 40, 10, 0)
+        counts, checked, mismatches = verify.rankChunk(task)
+        self.assertEqual(counts, expected)
+        self.assertEqual((checked, mismatches), (10, []))
+
+        saved = verify.numpy
+        verify.numpy = None
+        try:
+            self.assertEqual(verify.rankChunk(task), (counts, checked, mismatches))
+        finally:
+            verify.numpy = saved
+
+    def test_categories(self):
+        counts, checked, mismatches = verify.verify(range(36, 46), 200, 0)
+        self.assertEqual(sum(counts), equity.choose(16, 7))
+        self.assertEqual(checked, 200)
+        self.assertEqual(mismatches, [])
+        self.assertEqual(verify.verify(range(36, 46), 200, 0, workers=2),
+                         (counts, checked, mismatches))
+
+        # cards 36 to 51 are the fives down to the twos, so seven of them
+        # make at least two pair; three pairs is 2-2-2-1 of the four faces
+        categories = verify.categoryCounts(counts)
+        self.assertEqual(sum(categories), sum(counts))
+        self.assertEqual(categories[2], 4 * equity.choose(4, 2) ** 3 * 4)
+        self.assertEqual([categories[i] for i in (0, 1, 3, 4, 5, 8)], [0] * 6)
+
+class TestBench(unittest.TestCase):
+    def setUp(self):
+        self.saved = dict(bench.results)
+        bench.results.clear()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        bench.results.clear()
+        bench.results.update(self.saved)
+        shutil.rmtree(self.tmpdir)
+
+    def test_compare(self):
+        path = os.path.join(self.tmpdir, "baseline.json")
+        bench.results.update({"rate": (100.0, "hands/s"),
+                              "time": (10.0, "ms"),
+                              "new": (1.0, "ms")})
+        bench.save(path)
+        baseline = bench.load(path)
+        self.assertEqual(baseline["time"], (10.0, "ms"))
+        del baseline["new"]
+
+        bench.results.update({"rate": (85.0, "hands/s"), "time": (13.0, "ms")})
+        rows = bench.compare(baseline, 0.2)
+        self.assertEqual([row[:3] for row in rows],
+                         [("rate", 100.0, 85.0), ("time", 10.0, 13.0)])
+        self.assertAlmostEqual(rows[1][3], -0.3)
+        self.assertEqual([row[4] for row in rows], [False, True])
+        self.assertEqual([row[4] for row in bench.compare(baseline, 0.1)],
+                         [True, True])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python2
+# IRC Poker Duel - verify.py
+# Copyright (C) 2014  Daniel Kessler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Check the hand evaluator against every seven card hand.
+
+Usage: python2 verify.py [--workers N] [--check N] [--seed N]
+
+All 133,784,560 seven card hands are ranked with SevenEval, and --check of
+them, picked at random, are ranked again with FiveEval.getRankOfSeven,
+which is much slower but simply tries every five card hand.  The number of
+hands in each category is then compared with the known frequencies.  The
+exit status is 1 if anything does not match.
+
+The hands are split up by their two lowest cards, so the work can be shared
+between worker processes, which all map the same table file."""
+
+import argparse
+import sys
+import time
+from itertools import chain, combinations
+from random import Random
+
+import handnames
+import poker
+from equity import choose
+from specialk.SevenEval import numpy
+from workers import run as runJobs
+
+# The number of seven card hands in each of handnames.CATEGORIES
+EXPECTED = [23294460, 58627800, 31433400, 6461620, 6180020, 4047644,
+            3473184, 224848, 41584]
+HANDS = sum(EXPECTED)
+# Seven card hands only reach this many of the ranks: a hand like 7-5-4-3-2
+# is never the best five of seven distinct cards.
+SEVEN_CARD_RANKS = 4824
+
+CHECK = 100000
+# Hands are ranked this many at a time, to bound each worker's memory.
+BLOCK = 1 << 18
+
+# The five card subsets of range(n) for the largest n needed so far,
+# ordered so that the subsets of any smaller range come first.
+_rests = None
+
+def rests(n):
+    """Return the five card subsets of range(n), as an array of rows."""
+    global _rests
+    count = choose(n, 5)
+    if _rests is None or len(_rests) < count:
+        cards = numpy.fromiter(chain.from_iterable(combinations(range(n), 5)),
+                               dtype=numpy.uint8).reshape(-1, 5)
+        # sort by the highest card, then the next highest, and so on
+        _rests = cards[numpy.lexsort(cards.T)]
+    return _rests[:count]
+
+def rankChunk(task):
+    """Rank every hand whose two lowest cards are low and second, and
+    check the sampled ones.  task is (low, second, sample count, seed).
+    Returns (count of hands at each rank, hands checked, mismatches), where
+    mismatches is a list of (hand, SevenEval rank, FiveEval rank)."""
+    low, second, samples, seed = task
+    evaluator = poker.getEvaluator()
+    above = 51 - second
+    total = choose(above, 5)
+    sampled = sorted(Random(seed).sample(xrange(total), min(samples, total)))
+    mismatches = []
+
+    def check(rest, rank):
+        hand = (low, second) + tuple(rest)
+        five = evaluator.fiveEval.getRankOfSeven(*hand)
+        if five != rank:
+            mismatches.append((hand, rank, five))
+
+    if numpy == None:
+        counts = [0] * (handnames.RANKS + 1)
+        sampled = set(sampled)
+        for index, rest in enumerate(combinations(range(second + 1, 52), 5)):
+            rank = evaluator.getRankOfSeven(low, second, *rest)
+            counts[rank] += 1
+            if index in sampled:
+                check(rest, rank)
+        return counts, len(sampled), mismatches
+
+    # the subsets of range(above), turned into subsets of the cards above
+    # second by counting down from 51
+    subsets = rests(above)
+    hands = numpy.empty((BLOCK, 7), dtype=numpy.intp)
+    hands[:, 0] = low
+    hands[:, 1] = second
+    counts = numpy.zeros(handnames.RANKS + 1, dtype=numpy.int64)
+    for start in xrange(0, total, BLOCK):
+        block = hands[:min(BLOCK, total - start)]
+        block[:, 2:] = 51 - subsets[start:start + len(block)]
+        ranks = evaluator.getRanksOfSeven(block)
+        counts += numpy.bincount(ranks, minlength=handnames.RANKS + 1)
+        for index in sampled:
+            if start <= index < start + len(block):
+                check(block[index - start, 2:].tolist(),
+                      int(ranks[index - start]))
+    return counts.tolist(), len(sampled), mismatches
+
+def verify(lowest=range(46), check=CHECK, seed=None, workers=None):
+    """Rank every hand whose lowest card is in lowest, checking check of
+    them against FiveEval.  Returns (count of hands at each rank, hands
+    checked, mismatches)."""
+    pairs = [(low, second) for low in lowest for second in range(low + 1, 47)]
+    hands = sum(choose(51 - second, 5) for low, second in pairs)
+    rng = Random(seed)
+    tasks = []
+    # share the checks out in proportion to the hands in each task
+    done = 0
+    checks = 0
+    for low, second in pairs:
+        done += choose(51 - second, 5)
+        samples = check * done // hands - checks
+        checks += samples
+        tasks.append((low, second, samples, rng.getrandbits(64)))
+
+    counts = [0] * (handnames.RANKS + 1)
+    checked = 0
+    mismatches = []
+    for chunk_counts, chunk_checked, chunk_mismatches in runJobs(rankChunk, tasks, workers):
+        for rank, count in enumerate(chunk_counts):
+            counts[rank] += count
+        checked += chunk_checked
+        mismatches.extend(chunk_mismatches)
+    return counts, checked, mismatches
+
+def categoryCounts(counts):
+    """Add up counts, a count per rank, into a count per category."""
+    lookup = handnames.table()[0]
+    totals = [0] * len(handnames.CATEGORIES)
+    for rank in xrange(1, len(counts)):
+        totals[lookup[rank]] += counts[rank]
+    return totals
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+            description="Check the hand evaluator against every hand.")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--check", type=int, default=CHECK,
+                        help="how many hands to check against FiveEval "
+                             "(default {})".format(CHECK))
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    poker.getEvaluator()
+    start = time.time()
+    counts, checked, mismatches = verify(check=args.check, seed=args.seed,
+                                         workers=args.workers)
+    elapsed = time.time() - start
+    hands = sum(counts)
+
+    failed = False
+    print("{:16} {:>10} {:>10}".format("", "hands", "expected"))
+    for name, expected, count in zip(handnames.CATEGORIES, EXPECTED,
+                                     categoryCounts(counts)):
+        flag = ""
+        if count != expected:
+            flag = "  WRONG"
+            failed = True
+        print("{:16} {:10} {:10}{}".format(name, count, expected, flag))
+    print("{:16} {:10} {:10}".format("Total", hands, HANDS))
+
+    distinct = len([count for count in counts if count])
+    if hands != HANDS or distinct != SEVEN_CARD_RANKS:
+        failed = True
+    print("{} distinct ranks, expected {}".format(distinct, SEVEN_CARD_RANKS))
+
+    for hand, rank, five in mismatches[:20]:
+        print("{}: SevenEval gives {}, FiveEval gives {}".format(
+                poker.cardsToString(hand), rank, five))
+    print("Checked {} hands against FiveEval: {} mismatches".format(
+            checked, len(mismatches)))
+    if mismatches:
+        failed = True
+
+    print("Ranked {} hands in {:.2f} s: {:.0f} hands/s".format(
+            hands, elapsed, hands / elapsed))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,51 @@
+# IRC Poker Duel - workers.py
+# Copyright (C) 2014  Daniel Kessler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Process pools for CPU bound jobs such as equity runs and simulations.
+
+Each worker maps the evaluator table file instead of building its own
+tables, so every worker shares the same read-only pages."""
+
+from multiprocessing import Pool
+
+import poker
+from specialk import TableFile
+
+def attachEvaluator(path):
+    try:
+        poker.setEvaluator(TableFile.load(path))
+    except TableFile.TableFileError:
+        # the file could not be written; use the tables inherited from the
+        # parent process instead
+        poker.getEvaluator()
+
+def workerPool(workers):
+    """Return a Pool of workers processes with the evaluator attached."""
+    # make sure the table file exists before the workers look for it
+    poker.getEvaluator()
+    return Pool(workers, attachEvaluator, (poker.EVALUATOR_TABLES,))
+
+def run(job, tasks, workers=None):
+    """Return [job(t) for t in tasks], computed by workers processes if
+    workers is more than 1.  job must be a module level function."""
+    if workers == None or workers <= 1:
+        return map(job, tasks)
+    pool = workerPool(workers)
+    try:
+        return pool.map(job, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()